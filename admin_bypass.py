@@ -1,3 +1,90 @@
+import asyncio
+import itertools
+
+from lru import LRUCache, MISSING
+from config import ADMIN_CACHE_TTL, ADMIN_CACHE_FAIL_TTL, ADMIN_CACHE_MAX_CHATS
+
+ADMIN_STATUSES = ("administrator", "creator")
+
+# chat_id -> frozenset(admin_ids) | None (fetch fail hua tha), TTL + LRU
+_admin_cache = LRUCache(ADMIN_CACHE_MAX_CHATS, ttl=ADMIN_CACHE_TTL)
+# chat_id -> (generation, running roster fetch), taaki ek hi chat ke parallel misses ek hi call karein
+_inflight = {}
+_generations = itertools.count(1)
+_stats = {"hits": 0, "misses": 0, "refreshes": 0, "invalidations": 0, "failures": 0}
+
+
 async def is_admin(bot, chat_id, user_id):
     member = await bot.get_chat_member(chat_id, user_id)
-    return member.status in ["administrator", "creator"]
+    return member.status in ADMIN_STATUSES
+
+
+def _is_current(chat_id, generation):
+    # beech me invalidate hua to ye fetch purana roster laaya hai, cache me mat likho
+    entry = _inflight.get(chat_id)
+    return entry is not None and entry[0] == generation
+
+
+async def _load_admins(bot, chat_id, generation):
+    try:
+        admins = await bot.get_chat_administrators(chat_id)
+    except Exception:
+        # thodi der fail hi yaad rakho, warna har message pe roster + get_chat_member do calls
+        _stats["failures"] += 1
+        if _is_current(chat_id, generation):
+            _admin_cache.set(chat_id, None, ttl=ADMIN_CACHE_FAIL_TTL)
+        raise
+    roster = frozenset(m.user.id for m in admins)
+    _stats["refreshes"] += 1
+    if _is_current(chat_id, generation):
+        _admin_cache.set(chat_id, roster)
+    return roster
+
+
+async def get_admin_ids(bot, chat_id):
+    roster = _admin_cache.get(chat_id, MISSING)
+    if roster is not MISSING:
+        _stats["hits"] += 1
+        if roster is None:
+            raise LookupError(f"admin roster unavailable for {chat_id}")
+        return roster
+
+    _stats["misses"] += 1
+    inflight = _inflight.get(chat_id)
+    if inflight is None:
+        generation = next(_generations)
+        inflight = _inflight[chat_id] = (generation, asyncio.ensure_future(_load_admins(bot, chat_id, generation)))
+
+        def _done(_, inflight=inflight):
+            # invalidate ke baad naya fetch shuru ho chuka ho to use mat hatao
+            if _inflight.get(chat_id) is inflight:
+                del _inflight[chat_id]
+
+        inflight[1].add_done_callback(_done)
+    return await asyncio.shield(inflight[1])
+
+
+async def is_admin_cached(bot, chat_id, user_id):
+    # private chats me koi admin roster nahi hota
+    if chat_id > 0:
+        return False
+    try:
+        roster = await get_admin_ids(bot, chat_id)
+    except Exception:
+        # roster fetch fail hua (e.g. bot not admin) -> single lookup fallback
+        return await is_admin(bot, chat_id, user_id)
+    return user_id in roster
+
+
+def invalidate_admins(chat_id=None):
+    if chat_id is None:
+        _admin_cache.clear()
+        _inflight.clear()
+    else:
+        _admin_cache.pop(chat_id, None)
+        _inflight.pop(chat_id, None)
+    _stats["invalidations"] += 1
+
+
+def admin_cache_stats():
+    return {**_stats, "chats": len(_admin_cache)}
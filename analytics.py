@@ -0,0 +1,140 @@
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+from db import db
+from flusher import PeriodicFlusher
+from metrics import MONGO_SECONDS, MONGO_ERRORS
+from config import ANALYTICS_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_KEY_RE = re.compile(r"[^a-z0-9_]+")
+
+
+def _clean(value, default="other"):
+    # LLM category free text hoti hai; Mongo field name me "." / "$" nahi chal sakte
+    value = _KEY_RE.sub("_", str(value or "").lower()).strip("_")[:32]
+    return value or default
+
+
+def _hour(ts=None):
+    return (ts or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+
+
+class Rollups(PeriodicFlusher):
+    """Hourly per-chat counters of moderation actions, maintained with $inc.
+
+    Ek doc per (chat, hour): counts.<action>.<category> + total. Increments memory me
+    jama hote hain aur har ANALYTICS_FLUSH_INTERVAL ek unordered bulk_write me jaate hain;
+    reads sirf window ke hourly docs padhte hain, raw moderation_logs kabhi nahi.
+    """
+
+    def __init__(self, flush_interval=ANALYTICS_FLUSH_INTERVAL):
+        super().__init__(flush_interval)
+        self._pending = Counter()  # (chat_id, hour, action, category) -> n
+        self.stats = {"recorded": 0, "flushes": 0, "docs_written": 0, "errors": 0, "dropped": 0}
+
+    async def record(self, chat_id, action, category=None, ts=None):
+        self.stats["recorded"] += 1
+        self._pending[(chat_id, _hour(ts), _clean(action), _clean(category))] += 1
+        await self.flush_if_idle()
+
+    def _ops(self, pending):
+        # har op ke saath uske pending keys, taaki partial failure pe sirf wahi wapas jaayein
+        per_doc = defaultdict(Counter)
+        keys = defaultdict(list)
+        for key, n in pending.items():
+            chat_id, hour, action, category = key
+            per_doc[(chat_id, hour)][f"counts.{action}.{category}"] += n
+            per_doc[(chat_id, hour)]["total"] += n
+            keys[(chat_id, hour)].append(key)
+        ops = [
+            UpdateOne(
+                {"_id": f"{chat_id}:{hour:%Y%m%d%H}"},
+                {"$inc": dict(incs), "$setOnInsert": {"chat_id": chat_id, "hour": hour}},
+                upsert=True,
+            )
+            for (chat_id, hour), incs in per_doc.items()
+        ]
+        return ops, list(keys.values())
+
+    def _requeue(self, pending, keys):
+        for key in keys:
+            self._pending[key] += pending[key]
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, Counter()
+        ops, op_keys = self._ops(pending)
+        start = time.perf_counter()
+        try:
+            await db.analytics_hourly.bulk_write(ops, ordered=False)
+            self.stats["docs_written"] += len(ops)
+        except BulkWriteError as e:
+            # unordered: baaki $inc lag chuke hain, sirf fail hue ops retry (warna double count)
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            self.stats["errors"] += 1
+            self.stats["docs_written"] += len(ops) - len(failed)
+            MONGO_ERRORS.inc(op="analytics_flush")
+            logger.error("Analytics flush: %d/%d docs failed, retrying those", len(failed), len(ops))
+            for index in failed:
+                self._requeue(pending, op_keys[index])
+        except ServerSelectionTimeoutError as e:
+            # server mila hi nahi, kuch bhi nahi likha gaya -> pura batch retry safe hai
+            self.stats["errors"] += 1
+            MONGO_ERRORS.inc(op="analytics_flush")
+            logger.error("Analytics flush failed, no server (%d docs): %s", len(ops), e)
+            self._pending.update(pending)
+        except Exception as e:
+            # timeout / connection drop: commit hua ya nahi pata nahi, $inc dobara bhejna double count kar sakta hai
+            self.stats["errors"] += 1
+            self.stats["dropped"] += sum(pending.values())
+            MONGO_ERRORS.inc(op="analytics_flush")
+            logger.error("Analytics flush failed, dropping %d increments (%d docs): %s",
+                         sum(pending.values()), len(ops), e)
+        finally:
+            MONGO_SECONDS.observe(time.perf_counter() - start, op="analytics_flush")
+        self.stats["flushes"] += 1
+
+    async def summary(self, chat_id, hours=24):
+        """Totals for the last `hours` hourly buckets (unflushed increments included)."""
+        since = _hour() - timedelta(hours=hours - 1)
+        actions, categories, timeline = Counter(), Counter(), Counter()
+
+        def _add(hour, action, category, n):
+            actions[action] += n
+            categories[category] += n
+            timeline[hour] += n
+
+        start = time.perf_counter()
+        try:
+            async for doc in db.analytics_hourly.find({"chat_id": chat_id, "hour": {"$gte": since}}):
+                for action, per_category in (doc.get("counts") or {}).items():
+                    for category, n in per_category.items():
+                        _add(doc["hour"], action, category, n)
+        finally:
+            MONGO_SECONDS.observe(time.perf_counter() - start, op="analytics_summary")
+
+        for (cid, hour, action, category), n in self._pending.items():
+            if cid == chat_id and hour >= since:
+                _add(hour, action, category, n)
+
+        return {
+            "chat_id": chat_id,
+            "hours": hours,
+            "since": since.isoformat(),
+            "total": sum(actions.values()),
+            "actions": dict(actions.most_common()),
+            "categories": dict(categories.most_common()),
+            "hourly": {h.isoformat(): n for h, n in sorted(timeline.items())},
+        }
+
+
+rollups = Rollups()
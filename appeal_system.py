@@ -1,12 +1,14 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from config import APPEAL_STATE_TTL
+from state_store import StateStore
 
-appeals = {}
+appeals = StateStore("appeal_counts", APPEAL_STATE_TTL)
 
 async def handle_appeal(bot, user_id, chat_id, reason, admin_id):
-    count = appeals.get(user_id, 0)
+    count = await appeals.get(user_id, 0)
 
     if count < 4:
-        appeals[user_id] = count + 1
+        await appeals.incr(user_id)
         return False  # normal appeal processed
     else:
         # send to admin for review
@@ -0,0 +1,101 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from config import ARCHIVE_DIR, ARCHIVE_INTERVAL, ARCHIVE_SEGMENT_MAX
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)  # ObjectId etc.
+
+
+def _write_segment(path, lines):
+    # .part me likho, fsync, phir rename: adhi file kabhi final naam se nahi dikhti
+    tmp = f"{path}.part"
+    with gzip.open(tmp, "wb") as fh:
+        for line in lines:
+            fh.write(line)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class Archiver:
+    """Moves moderation_logs / appeals past their retention horizon into gzip JSONL segments,
+    deleting each batch from Mongo only after its segment is safely on disk."""
+
+    def __init__(self, directory=ARCHIVE_DIR, interval=ARCHIVE_INTERVAL, segment_max=ARCHIVE_SEGMENT_MAX):
+        self.directory = directory
+        self.interval = interval
+        self.segment_max = segment_max
+        self._task = None
+        self.stats = {"runs": 0, "archived": 0, "deleted": 0, "segments": 0, "errors": 0}
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error("Archive run failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self):
+        from models import RETENTION_DAYS
+
+        self.stats["runs"] += 1
+        for collection, days in RETENTION_DAYS.items():
+            if days > 0:
+                cutoff = datetime.utcnow() - timedelta(days=days)
+                while await self._archive_segment(collection, cutoff) >= self.segment_max:
+                    pass  # backlog: full segment bana, aur bhi expired docs ho sakte hain
+
+    async def _archive_segment(self, collection, cutoff):
+        from models import iter_expired, delete_archived
+
+        ids, lines = [], []
+        async for doc in iter_expired(collection, cutoff, self.segment_max):
+            ids.append(doc["_id"])
+            lines.append(json.dumps(doc, default=_json_default, ensure_ascii=False).encode("utf-8") + b"\n")
+        if not ids:
+            return 0
+
+        folder = os.path.join(self.directory, collection)
+        os.makedirs(folder, exist_ok=True)
+        # naam chunk ke pehle/aakhri _id se: write ke baad delete se pehle crash hua to
+        # agla run same file overwrite karega, duplicate segment nahi banega
+        path = os.path.join(folder, f"{collection}-{ids[0]}-{ids[-1]}.jsonl.gz")
+
+        # gzip + fsync blocking hai, event loop ko mat roko
+        await asyncio.get_running_loop().run_in_executor(None, _write_segment, path, lines)
+        self.stats["segments"] += 1
+        self.stats["archived"] += len(ids)
+
+        self.stats["deleted"] += await delete_archived(collection, ids)
+        logger.info("Archived %d %s docs to %s", len(ids), collection, path)
+        return len(ids)
+
+
+archiver = Archiver()
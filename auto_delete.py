@@ -1,9 +1,5 @@
-import asyncio
+from deletion_scheduler import deletion_scheduler
 
-async def auto_delete(bot, chat_id, text):
+async def auto_delete(bot, chat_id, text, seconds: int = 9):
     msg = await bot.send_message(chat_id, text)
-    await asyncio.sleep(9)
-    try:
-        await msg.delete()
-    except:
-        pass
+    await deletion_scheduler.schedule(chat_id, msg.message_id, seconds)
@@ -0,0 +1,208 @@
+# Offline re-moderation of exported chat history (JSONL) - rules tune karne / audit ke liye.
+#
+#   python backfill.py export.jsonl -o verdicts.jsonl --rules-file rules.txt
+#   python backfill.py export.jsonl -o verdicts.jsonl --db-rules --concurrency 32
+#
+# Har input line ek Update JSON ya {"chat_id", "user_id", "username", "text", ...} record ho sakti hai.
+# File stream hoti hai (poori memory me load nahi hoti), output input order me likha jata hai,
+# aur <output>.ckpt se Ctrl+C / crash ke baad wahi se resume hota hai.
+import argparse
+import asyncio
+import collections
+import json
+import os
+import sys
+import time
+
+from moderation import moderate_message, moderation_batcher, llm_stats
+
+VERDICT_FIELDS = ("action", "reason", "category", "severity", "should_delete", "confidence", "source", "tier")
+
+
+def _text(value):
+    # Telegram Desktop export me text entities ki list hota hai
+    if isinstance(value, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in value)
+    return value
+
+
+def extract(record):
+    msg = record.get("message") or record.get("edited_message") or record.get("channel_post") or record
+    text = _text(msg.get("text")) or _text(msg.get("caption"))
+    chat = msg.get("chat") or {"id": msg.get("chat_id"), "title": msg.get("chat_title")}
+    user = msg.get("from")
+    if not isinstance(user, dict):
+        user = {
+            "id": msg.get("user_id") or msg.get("from_id"),
+            "username": msg.get("username"),
+            "first_name": msg.get("first_name") or msg.get("from"),
+        }
+    return text, user, chat, msg.get("message_id") or msg.get("id")
+
+
+# ───────────── CHECKPOINT ─────────────
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {"line": 0, "offset": 0}
+
+
+def save_checkpoint(path, line, offset):
+    # tmp + replace, taaki crash pe adhi likhi checkpoint file na bache
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"line": line, "offset": offset}, fh)
+    os.replace(tmp, path)
+
+
+# ───────────── PIPELINE ─────────────
+
+class Backfill:
+    def __init__(self, args):
+        self.args = args
+        self.sem = asyncio.Semaphore(args.concurrency)
+        self.static_rules = ""
+        if args.rules_file:
+            with open(args.rules_file, encoding="utf-8") as fh:
+                self.static_rules = fh.read().strip()
+        self.stats = collections.Counter()
+        self.actions = collections.Counter()
+
+    async def _rules(self, chat_id):
+        if not self.args.db_rules or chat_id is None:
+            return self.static_rules
+        from models import get_rules_text
+        return await get_rules_text(int(chat_id))
+
+    async def moderate(self, line_no, raw):
+        try:
+            record = json.loads(raw)
+            text, user, chat, message_id = extract(record)
+        except (ValueError, AttributeError):
+            self.stats["bad_lines"] += 1
+            return None
+        if not text:
+            self.stats["skipped"] += 1
+            return None
+
+        async with self.sem:
+            rules_text = await self._rules(chat.get("id"))
+            verdict = await moderate_message(text, user, chat, rules_text)
+
+        self.stats["moderated"] += 1
+        self.stats[f"source_{verdict.get('source')}"] += 1
+        self.actions[verdict.get("action", "allow")] += 1
+        out = {"line": line_no, "chat_id": chat.get("id"), "message_id": message_id, "user_id": user.get("id")}
+        if self.args.include_text:
+            out["text"] = text
+        out.update({k: verdict[k] for k in VERDICT_FIELDS if k in verdict})
+        return out
+
+    def _progress(self, line_no, start):
+        elapsed = time.perf_counter() - start
+        rate = self.stats["moderated"] / elapsed if elapsed > 0 else 0.0
+        print(f"line {line_no}: {self.stats['moderated']} moderated, {rate:.1f} msg/s, "
+              f"{llm_stats()['calls']} LLM calls", file=sys.stderr)
+
+    async def run(self):
+        args = self.args
+        ckpt_path = f"{args.output}.ckpt"
+        ckpt = {"line": 0, "offset": 0}
+        if args.resume and os.path.exists(args.output):
+            ckpt = load_checkpoint(ckpt_path)
+        if ckpt["line"]:
+            print(f"resuming after line {ckpt['line']}", file=sys.stderr)
+
+        out = open(args.output, "r+" if ckpt["line"] else "w", encoding="utf-8")
+        # checkpoint ke baad ka half-written output hata do, warna resume pe duplicates aayenge
+        out.seek(ckpt["offset"])
+        out.truncate()
+
+        # window: itne lines in-flight, output phir bhi input order me (head ka wait)
+        window = collections.deque()
+        written_line = ckpt["line"]
+        since_checkpoint = 0
+        start = last_report = time.perf_counter()
+
+        async def write_head():
+            nonlocal written_line, since_checkpoint, last_report
+            line_no, task = window.popleft()
+            result = await task
+            if result is not None:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            written_line = line_no
+            since_checkpoint += 1
+            if since_checkpoint >= args.checkpoint_every:
+                since_checkpoint = 0
+                out.flush()
+                save_checkpoint(ckpt_path, written_line, out.tell())
+            if time.perf_counter() - last_report >= args.progress_every:
+                last_report = time.perf_counter()
+                self._progress(line_no, start)
+
+        try:
+            with open(args.input, encoding="utf-8") as src:
+                for line_no, raw in enumerate(src, 1):
+                    if line_no <= ckpt["line"]:
+                        continue
+                    if args.limit and line_no > ckpt["line"] + args.limit:
+                        break
+                    raw = raw.strip()
+                    if not raw:
+                        continue
+                    window.append((line_no, asyncio.create_task(self.moderate(line_no, raw))))
+                    if len(window) >= args.concurrency * 4:
+                        await write_head()
+            while window:
+                await write_head()
+        finally:
+            for _, task in window:
+                task.cancel()
+            out.flush()
+            save_checkpoint(ckpt_path, written_line, out.tell())
+            out.close()
+            await moderation_batcher.drain()
+
+        elapsed = time.perf_counter() - start
+        return {
+            "lines": written_line - ckpt["line"],
+            "elapsed_s": round(elapsed, 2),
+            "msgs_per_s": round(self.stats["moderated"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "llm_calls": llm_stats()["calls"],
+            **self.stats,
+            **{f"action_{k}": v for k, v in self.actions.items()},
+        }
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Re-run moderation over a JSONL chat export")
+    p.add_argument("input", help="JSONL file: Update JSON or flat {chat_id, user_id, text} records")
+    p.add_argument("-o", "--output", required=True, help="verdicts JSONL (checkpoint: <output>.ckpt)")
+    p.add_argument("--rules-file", help="rules text used for every message")
+    p.add_argument("--db-rules", action="store_true", help="load each chat's rules from Mongo instead")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--checkpoint-every", type=int, default=500, help="input lines between checkpoints")
+    p.add_argument("--progress-every", type=float, default=10, help="seconds between progress lines")
+    p.add_argument("--limit", type=int, default=0, help="stop after N input lines (0 = all)")
+    p.add_argument("--no-resume", dest="resume", action="store_false", help="ignore an existing checkpoint")
+    p.add_argument("--include-text", action="store_true", help="copy message text into the output")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        summary = asyncio.run(Backfill(args).run())
+    except KeyboardInterrupt:
+        print(f"interrupted, resume with the same command (checkpoint: {args.output}.ckpt)", file=sys.stderr)
+        return 130
+    for key, value in summary.items():
+        print(f"{key:>18}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import asyncio
+import itertools
+import logging
+
+from config import BATCH_ENABLED, BATCH_MAX_SIZE, BATCH_WINDOW_MS
+
+logger = logging.getLogger(__name__)
+
+
+class ModerationBatcher:
+    """Collects messages per key for a short window and classifies them in one LLM request.
+
+    run_batch(list of (item_id, payload)) -> {item_id: verdict}
+    run_single(payload) -> verdict  (batch fail / missing ids ke liye fallback)
+    backlog(shards) -> kitne aur shards is batch me message de sakte hain; 0 ho to
+    window ka wait nahi hota, batch (ya akela message) turant chala jaata hai.
+    cross_shard=False wali keys (ek hi chat) me doosre shards ka message kabhi nahi aata.
+    """
+
+    def __init__(self, run_batch, run_single, max_size=BATCH_MAX_SIZE,
+                 window_ms=BATCH_WINDOW_MS, enabled=BATCH_ENABLED):
+        self.run_batch = run_batch
+        self.run_single = run_single
+        self.max_size = max(1, max_size)
+        self.window = window_ms / 1000
+        self.enabled = enabled and self.max_size > 1
+        self._ids = itertools.count(1)
+        self._pending = {}  # key -> [(item_id, payload, future)]
+        self._timers = {}
+        self._tasks = set()
+        self.backlog = None
+        self.stats = {"batches": 0, "batched_items": 0, "singles": 0, "fallbacks": 0, "no_wait": 0}
+
+    async def submit(self, key, payload, shard=None, cross_shard=True):
+        if not self.enabled:
+            self.stats["singles"] += 1
+            return await self.run_single(payload)
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((str(next(self._ids)), payload, fut, shard))
+
+        if len(batch) >= self.max_size or not self._more_coming(batch, cross_shard):
+            # koi aur message aane wala nahi, window ka wait sirf latency badhata
+            if len(batch) < self.max_size:
+                self.stats["no_wait"] += 1
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await fut
+
+    def _more_coming(self, batch, cross_shard):
+        if self.backlog is None:
+            return True
+        if not cross_shard:
+            # shard ke andar updates serial hain, is key ka agla message isi ke baad aayega
+            return False
+        return self.backlog([entry[3] for entry in batch]) > 0
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _single(self, payload, fut):
+        try:
+            verdict = await self.run_single(payload)
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        if not fut.done():
+            fut.set_result(verdict)
+
+    async def _run(self, batch):
+        # waiter cancel ho chuka ho to uska message bhejne ka fayda nahi
+        batch = [entry for entry in batch if not entry[2].done()]
+        if not batch:
+            return
+        if len(batch) == 1:
+            self.stats["singles"] += 1
+            _, payload, fut, _ = batch[0]
+            await self._single(payload, fut)
+            return
+
+        try:
+            verdicts = await self.run_batch([(item_id, payload) for item_id, payload, _, _ in batch])
+        except Exception as e:
+            logger.warning("Batch moderation failed (%d msgs), falling back to single calls: %s", len(batch), e)
+            verdicts = {}
+
+        self.stats["batches"] += 1
+        missing = []
+        for item_id, payload, fut, _ in batch:
+            verdict = verdicts.get(item_id)
+            if verdict is None:
+                missing.append((payload, fut))
+            elif not fut.done():
+                fut.set_result(verdict)
+        self.stats["batched_items"] += len(batch) - len(missing)
+
+        if missing:
+            self.stats["fallbacks"] += len(missing)
+            await asyncio.gather(*(self._single(payload, fut) for payload, fut in missing))
+
+    async def drain(self):
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
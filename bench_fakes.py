@@ -0,0 +1,405 @@
+# Offline stand-ins for the benchmark harness: in-memory Mongo, fake Bot API transport, fake Gemini.
+# Har stand-in ka latency configurable hai aur calls count hote hain.
+import asyncio
+import copy
+import itertools
+import json
+import re
+import time
+from collections import Counter, defaultdict
+
+from telegram.request import BaseRequest
+
+
+async def _sleep(latency):
+    if latency > 0:
+        await asyncio.sleep(latency)
+
+
+# ───────────── IN-MEMORY MONGO (motor-style async API) ─────────────
+
+def _get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _set_path(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+_OPS = {
+    "$in": lambda v, arg: v in arg,
+    "$nin": lambda v, arg: v not in arg,
+    "$ne": lambda v, arg: v != arg,
+    "$lt": lambda v, arg: v is not None and v < arg,
+    "$lte": lambda v, arg: v is not None and v <= arg,
+    "$gt": lambda v, arg: v is not None and v > arg,
+    "$gte": lambda v, arg: v is not None and v >= arg,
+    "$exists": lambda v, arg: (v is not None) == bool(arg),
+}
+
+
+def _matches(doc, flt):
+    for key, cond in (flt or {}).items():
+        value = _get_path(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            if not all(_OPS[op](value, arg) for op, arg in cond.items()):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        out = {k: doc[k] for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    for k, v in projection.items():
+        if not v:
+            doc.pop(k, None)
+    return doc
+
+
+def _apply_update(doc, update, inserting):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$inc":
+                _set_path(doc, path, (_get_path(doc, path) or 0) + value)
+            elif op == "$addToSet":
+                current = _get_path(doc, path) or []
+                if value not in current:
+                    current = current + [value]
+                _set_path(doc, path, current)
+            elif op == "$unset":
+                parent = _get_path(doc, path.rpartition(".")[0]) if "." in path else doc
+                if isinstance(parent, dict):
+                    parent.pop(path.rpartition(".")[2], None)
+            else:
+                raise NotImplementedError(f"update operator {op}")
+
+
+class _Result:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, key, direction=1):
+        if isinstance(key, list):
+            key, direction = key[0]
+        self._docs.sort(key=lambda d: (_get_path(d, key) is None, _get_path(d, key)), reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        if n:
+            self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return self._docs if length is None else self._docs[:length]
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self._docs:
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._docs = {}  # _id -> doc
+        self._ids = itertools.count(1)
+        self._indexes = {}
+
+    async def _op(self, name):
+        self.database.ops[f"{self.name}.{name}"] += 1
+        await _sleep(self.database.latency)
+
+    def _find(self, flt):
+        if flt and set(flt) == {"_id"} and not isinstance(flt["_id"], dict):
+            doc = self._docs.get(flt["_id"])
+            return [doc] if doc is not None else []
+        return [d for d in self._docs.values() if _matches(d, flt)]
+
+    def _insert(self, doc):
+        doc.setdefault("_id", next(self._ids))
+        self._docs[doc["_id"]] = copy.deepcopy(doc)
+        return doc["_id"]
+
+    def _upsert_doc(self, flt):
+        doc = {k: v for k, v in flt.items() if not (isinstance(v, dict) and any(x.startswith("$") for x in v))}
+        return doc
+
+    async def find_one(self, flt=None, projection=None):
+        await self._op("find_one")
+        found = self._find(flt)
+        return _project(found[0], projection) if found else None
+
+    def find(self, flt=None, projection=None):
+        self.database.ops[f"{self.name}.find"] += 1
+        return FakeCursor([_project(d, projection) for d in self._find(flt)])
+
+    async def insert_one(self, doc):
+        await self._op("insert_one")
+        return _Result(inserted_id=self._insert(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        await self._op("insert_many")
+        return _Result(inserted_ids=[self._insert(d) for d in docs])
+
+    async def _update(self, flt, update, upsert):
+        found = self._find(flt)
+        if found:
+            _apply_update(found[0], update, inserting=False)
+            return found[0], False
+        if not upsert:
+            return None, False
+        doc = self._upsert_doc(flt)
+        _apply_update(doc, update, inserting=True)
+        self._insert(doc)
+        return self._docs[doc["_id"]], True
+
+    async def update_one(self, flt, update, upsert=False):
+        await self._op("update_one")
+        doc, inserted = await self._update(flt, update, upsert)
+        return _Result(matched_count=int(doc is not None and not inserted),
+                       upserted_id=doc["_id"] if inserted else None)
+
+    async def bulk_write(self, requests, ordered=True):
+        # pymongo UpdateOne objects (registry flush); ek round trip count hota hai
+        await self._op("bulk_write")
+        upserted = modified = 0
+        for req in requests:
+            doc, inserted = await self._update(req._filter, req._doc, req._upsert)
+            upserted += inserted
+            modified += int(doc is not None and not inserted)
+        return _Result(upserted_count=upserted, modified_count=modified)
+
+    async def find_one_and_update(self, flt, update, upsert=False, return_document=False, projection=None):
+        await self._op("find_one_and_update")
+        found = self._find(flt)
+        before = copy.deepcopy(found[0]) if found else None
+        doc, _ = await self._update(flt, update, upsert)
+        result = doc if return_document else before
+        return _project(result, projection) if result is not None else None
+
+    async def find_one_and_delete(self, flt):
+        await self._op("find_one_and_delete")
+        found = self._find(flt)
+        if not found:
+            return None
+        return self._docs.pop(found[0]["_id"])
+
+    async def delete_one(self, flt):
+        await self._op("delete_one")
+        found = self._find(flt)
+        if found:
+            del self._docs[found[0]["_id"]]
+        return _Result(deleted_count=len(found[:1]))
+
+    async def delete_many(self, flt):
+        await self._op("delete_many")
+        found = self._find(flt)
+        for doc in found:
+            del self._docs[doc["_id"]]
+        return _Result(deleted_count=len(found))
+
+    async def count_documents(self, flt):
+        await self._op("count_documents")
+        return len(self._find(flt))
+
+    def aggregate(self, pipeline):
+        # benchmark me sirf ensure_indexes ka duplicate-merge pipeline aata hai, jo fake me kabhi match nahi karta
+        self.database.ops[f"{self.name}.aggregate"] += 1
+        return FakeCursor([])
+
+    async def create_index(self, keys, name=None, **kwargs):
+        name = name or "_".join(f"{k}_{d}" for k, d in keys)
+        self._indexes[name] = {"key": keys, **kwargs}
+        return name
+
+    async def index_information(self):
+        return dict(self._indexes)
+
+    async def drop_index(self, name):
+        self._indexes.pop(name, None)
+
+    def __len__(self):
+        return len(self._docs)
+
+
+class FakeDatabase:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.ops = Counter()
+        self._collections = {}
+
+    def __getitem__(self, name):
+        coll = self._collections.get(name)
+        if coll is None:
+            coll = self._collections[name] = FakeCollection(self, name)
+        return coll
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, *args, **kwargs):
+        return {"ok": 1}
+
+
+class FakeMongoClient:
+    def __init__(self, database):
+        self.database = database
+        self.admin = database
+
+    def __getitem__(self, name):
+        return self.database
+
+    def close(self):
+        pass
+
+
+# ───────────── FAKE BOT API ─────────────
+
+class FakeTelegramRequest(BaseRequest):
+    """Answers Bot API calls locally instead of hitting api.telegram.org."""
+
+    def __init__(self, latency=0.0, bot_id=999000, admin_ids=(1,)):
+        self.latency = latency
+        self.bot_id = bot_id
+        self.admin_ids = admin_ids
+        self.calls = Counter()
+        self._message_ids = itertools.count(10_000)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _user(self, user_id, is_bot=False):
+        return {"id": user_id, "is_bot": is_bot, "first_name": f"user{user_id}", "username": f"user{user_id}"}
+
+    def _chat(self, chat_id):
+        chat_id = int(chat_id)
+        if chat_id > 0:
+            return {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"}
+        return {"id": chat_id, "type": "supergroup", "title": f"group{chat_id}"}
+
+    def _result(self, endpoint, params):
+        if endpoint == "getMe":
+            return {**self._user(self.bot_id, is_bot=True), "username": "bench_bot",
+                    "can_join_groups": True, "can_read_all_group_messages": True, "supports_inline_queries": False}
+        if endpoint in ("sendMessage", "editMessageText"):
+            return {"message_id": next(self._message_ids), "date": int(time.time()),
+                    "chat": self._chat(params["chat_id"]), "text": params.get("text", "")}
+        if endpoint == "getChatAdministrators":
+            return [{"status": "creator", "user": self._user(uid), "is_anonymous": False} for uid in self.admin_ids]
+        if endpoint == "getChatMember":
+            uid = int(params["user_id"])
+            status = "administrator" if uid in self.admin_ids else "member"
+            if status == "member":
+                return {"status": status, "user": self._user(uid)}
+            return {"status": status, "user": self._user(uid), "can_be_edited": False, "is_anonymous": False,
+                    "can_manage_chat": True, "can_delete_messages": True, "can_manage_video_chats": True,
+                    "can_restrict_members": True, "can_promote_members": False, "can_change_info": True,
+                    "can_invite_users": True, "can_post_stories": False, "can_edit_stories": False,
+                    "can_delete_stories": False}
+        if endpoint == "getChat":
+            return {**self._chat(params["chat_id"]), "accent_color_id": 0, "max_reaction_count": 11}
+        return True
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        await _sleep(self.latency)
+        params = request_data.parameters if request_data is not None else {}
+        body = {"ok": True, "result": self._result(endpoint, params)}
+        return 200, json.dumps(body).encode("utf-8")
+
+
+# ───────────── FAKE GEMINI ─────────────
+
+_MESSAGES_RE = re.compile(r"MESSAGES:\s*(\[.*\])\s*$", re.S)
+_MESSAGE_RE = re.compile(r"MESSAGE:\s*(.*?)\s*$", re.S)
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class _Response:
+    def __init__(self, text, prompt):
+        self.text = text
+        self.usage_metadata = _Usage(len(prompt) // 4, len(text) // 4)
+
+
+class FakeGeminiModel:
+    """Deterministic stand-in for GenerativeModel: 'spam'/'scam' messages are deleted, rest allowed."""
+
+    BAD_WORDS = ("spam", "scam", "idiot")
+
+    def __init__(self, model_name="models/fake-gemini", latency=0.0, stats=None):
+        self.model_name = model_name
+        self.latency = latency
+        self.stats = stats if stats is not None else defaultdict(int)
+
+    def _verdict(self, text):
+        lowered = (text or "").lower()
+        if any(w in lowered for w in self.BAD_WORDS):
+            return {"action": "delete", "reason": "spam", "category": "spam", "severity": 3,
+                    "should_delete": True, "confidence": 0.95}
+        return {"action": "allow", "reason": "ok", "category": "other", "severity": 1,
+                "should_delete": False, "confidence": 0.9}
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.stats["calls"] += 1
+        self.stats[f"calls:{self.model_name}"] += 1
+        await _sleep(self.latency)
+        if isinstance(prompt, (list, tuple)):
+            prompt = "\n".join(str(p) for p in prompt)
+
+        if "APPEAL" in prompt:
+            return _Response(json.dumps({"approve": True, "reason": "sorry"}), prompt)
+
+        batch = _MESSAGES_RE.search(prompt)
+        if batch:
+            items = json.loads(batch.group(1))
+            self.stats["batched_messages"] += len(items)
+            verdicts = [{"id": m["id"], **self._verdict(m.get("message"))} for m in items]
+            return _Response(json.dumps({"verdicts": verdicts}), prompt)
+
+        single = _MESSAGE_RE.search(prompt)
+        return _Response(json.dumps(self._verdict(single.group(1) if single else "")), prompt)
@@ -0,0 +1,240 @@
+# Offline load test: replays Update JSON against telegram_webhook with fake Bot API, Gemini and Mongo.
+#
+#   python benchmark.py --updates 5000 --chats 50 --gemini-latency 0.4
+#   python benchmark.py --replay updates.jsonl --max-llm-per-1k 300 --max-shed 0
+#
+# Exit code 1 jab koi --max-* / --min-* threshold fail ho; CI thresholds: .github/workflows/benchmark.yml
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+TRIVIAL = ["ok", "gm", "gn", "thanks", "lol", "👍", "🔥🔥", "haha", "hi", "yes"]
+NORMAL = [
+    "kal meeting kitne baje hai?",
+    "has anyone tried the new release yet",
+    "bhai ye bug abhi bhi aa raha hai",
+    "check the pinned message for the schedule",
+    "what time does the stream start today",
+]
+SPAM = "🚀 FREE crypto airdrop, claim now at scam-link.example 🚀"
+
+
+def _setup_environment(args):
+    # config / main import se pehle env set karo
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    os.environ.setdefault("MONGO_URI", "mongodb://bench.invalid")
+    os.environ.setdefault("WEBHOOK_HOST", "https://bench.invalid")
+    os.environ.setdefault("WEBHOOK_SECRET", "bench-secret")
+    os.environ["SCALE_OUT_WORKERS"] = "0"
+
+    from telegram.ext import ApplicationBuilder
+    import bench_fakes
+    import db as db_module
+
+    fake_db = bench_fakes.FakeDatabase(latency=args.mongo_latency)
+    db_module.db = fake_db
+    db_module.mongo_client = bench_fakes.FakeMongoClient(fake_db)
+
+    fake_request = bench_fakes.FakeTelegramRequest(latency=args.telegram_latency)
+    original_build = ApplicationBuilder.build
+
+    def build(builder):
+        builder.request(fake_request).get_updates_request(bench_fakes.FakeTelegramRequest())
+        return original_build(builder)
+
+    ApplicationBuilder.build = build
+
+    import main
+    import moderation
+
+    # moderation.py models ko call time pe module global se padhta hai
+    gemini_stats = defaultdict(int)
+    moderation.moderation_model = bench_fakes.FakeGeminiModel(latency=args.gemini_latency, stats=gemini_stats)
+    moderation.moderation_batch_model = bench_fakes.FakeGeminiModel(latency=args.gemini_latency, stats=gemini_stats)
+    moderation.escalation_model = bench_fakes.FakeGeminiModel("models/fake-gemini-strong", latency=args.gemini_latency * 2, stats=gemini_stats)
+    moderation.appeal_model = bench_fakes.FakeGeminiModel(latency=args.gemini_latency, stats=gemini_stats)
+
+    ApplicationBuilder.build = original_build
+    return main, fake_db, fake_request, gemini_stats
+
+
+def synthetic_updates(args):
+    rnd = random.Random(args.seed)
+    chats = [-1001000000000 - i for i in range(args.chats)]
+    users = list(range(100, 100 + args.users))
+    message_ids = {}
+    for update_id in range(1, args.updates + 1):
+        chat_id = rnd.choice(chats)
+        user_id = rnd.choice(users)
+        message_ids[chat_id] = message_ids.get(chat_id, 0) + 1
+        roll = rnd.random()
+        if roll < 0.45:
+            text = rnd.choice(TRIVIAL)
+        elif roll < 0.55:
+            text = SPAM
+        else:
+            text = f"{rnd.choice(NORMAL)} #{rnd.randint(1, 10_000)}"
+        yield {
+            "update_id": update_id,
+            "message": {
+                "message_id": message_ids[chat_id],
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup", "title": f"bench {chat_id}"},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"u{user_id}", "username": f"u{user_id}"},
+                "text": text,
+            },
+        }
+
+
+def recorded_updates(path):
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[idx]
+
+
+async def run(args):
+    import httpx
+
+    main, fake_db, fake_request, gemini_stats = _setup_environment(args)
+
+    sent_at, done_at = {}, {}
+    process = main.dispatcher.process
+
+    async def timed_process(update):
+        try:
+            await process(update)
+        finally:
+            done_at[update.update_id] = time.perf_counter()
+
+    main.dispatcher.process = timed_process
+
+    updates = list(recorded_updates(args.replay)) if args.replay else list(synthetic_updates(args))
+    if args.shared_batching:
+        for chat_id in {(u.get("message") or {}).get("chat", {}).get("id") for u in updates} - {None}:
+            await fake_db.chat_settings.insert_one({"chat_id": chat_id, "batching": {"shared": True}})
+    await main.startup()
+    text_messages = sum(1 for u in updates if (u.get("message") or {}).get("text"))
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": os.environ["WEBHOOK_SECRET"]}
+    rnd = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=main.app)
+    sem = asyncio.Semaphore(args.concurrency)
+    interval = 1 / args.rate if args.rate else 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def post(data):
+            async with sem:
+                sent_at.setdefault(data["update_id"], time.perf_counter())
+                await client.post(main.WEBHOOK_PATH, json=data, headers=headers)
+
+        start = time.perf_counter()
+        tasks = []
+        for data in updates:
+            tasks.append(asyncio.create_task(post(data)))
+            if rnd.random() < args.retry_rate:
+                # Telegram-style retry of the same update
+                tasks.append(asyncio.create_task(post(data)))
+            if interval:
+                await asyncio.sleep(interval)
+        await asyncio.gather(*tasks)
+
+        deadline = time.perf_counter() + args.timeout
+        while len(done_at) < len(sent_at) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = (max(done_at.values()) if done_at else time.perf_counter()) - start
+
+    await main.shutdown()
+
+    latencies = [(done_at[uid] - sent_at[uid]) * 1000 for uid in done_at if uid in sent_at]
+    report = {
+        "updates_sent": len(sent_at),
+        "updates_done": len(done_at),
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(len(done_at) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "llm_calls": gemini_stats["calls"],
+        "llm_calls_per_1k_msgs": round(gemini_stats["calls"] * 1000 / text_messages, 1) if text_messages else 0.0,
+        "telegram_calls": sum(fake_request.calls.values()),
+        "mongo_ops": sum(fake_db.ops.values()),
+        "prompt_tokens_est": main.prompt_stats()["prompt_tokens_est"],
+        "llm_escalations": main.tier_stats()["escalated"],
+        "duplicates_dropped": main.ingress_stats["duplicates"],
+        "updates_shed": main.ingress_stats["shed"],
+    }
+    return report
+
+
+def check_thresholds(report, args):
+    failures = []
+    if args.max_p99_ms is not None and report["p99_ms"] > args.max_p99_ms:
+        failures.append(f"p99 {report['p99_ms']}ms > {args.max_p99_ms}ms")
+    if args.min_ups is not None and report["updates_per_s"] < args.min_ups:
+        failures.append(f"throughput {report['updates_per_s']}/s < {args.min_ups}/s")
+    if args.max_llm_per_1k is not None and report["llm_calls_per_1k_msgs"] > args.max_llm_per_1k:
+        failures.append(f"LLM calls/1k {report['llm_calls_per_1k_msgs']} > {args.max_llm_per_1k}")
+    if args.max_shed is not None and report["updates_shed"] > args.max_shed:
+        failures.append(f"{report['updates_shed']} updates shed > {args.max_shed}")
+    if report["updates_done"] < report["updates_sent"]:
+        failures.append(f"only {report['updates_done']}/{report['updates_sent']} updates finished")
+    return failures
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Offline webhook load test with fake Telegram, Gemini and Mongo")
+    p.add_argument("--replay", help="JSONL file of recorded Update JSON (default: synthetic)")
+    p.add_argument("--updates", type=int, default=2000)
+    p.add_argument("--chats", type=int, default=20)
+    p.add_argument("--users", type=int, default=500)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--rate", type=float, default=0, help="updates/sec to send (0 = as fast as possible)")
+    p.add_argument("--concurrency", type=int, default=64, help="parallel webhook requests")
+    p.add_argument("--retry-rate", type=float, default=0.0, help="fraction of updates posted twice")
+    p.add_argument("--gemini-latency", type=float, default=0.3, help="seconds per fake Gemini call")
+    p.add_argument("--telegram-latency", type=float, default=0.02, help="seconds per fake Bot API call")
+    p.add_argument("--mongo-latency", type=float, default=0.002, help="seconds per fake Mongo op")
+    p.add_argument("--shared-batching", action="store_true", help="opt every chat into cross-chat batching (/batching on)")
+    p.add_argument("--timeout", type=float, default=120, help="max seconds to wait for processing")
+    p.add_argument("--max-p99-ms", type=float)
+    p.add_argument("--min-ups", type=float)
+    p.add_argument("--max-llm-per-1k", type=float)
+    p.add_argument("--max-shed", type=int, help="max updates dropped by ingress load shedding")
+    p.add_argument("--json", action="store_true", help="print the report as JSON only")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    failures = check_thresholds(report, args)
+
+    if args.json:
+        print(json.dumps({**report, "failures": failures}))
+    else:
+        for key, value in report.items():
+            print(f"{key:>24}: {value}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
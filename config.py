@@ -8,9 +8,17 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "telegram_ai_mod")
 
+# Mongo connection pool (db.py)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "60000"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+
 OWNER_ID = int(os.getenv("OWNER_ID", "0"))
 
 MAX_WARNINGS = 3
+# Warnings itne ghante bina naye warning ke expire ho jaate hain (0 = kabhi nahi)
+WARNING_WINDOW_HOURS = int(os.getenv("WARNING_WINDOW_HOURS", "0"))
 MUTE_DURATION_MIN = 10
 
 ENABLE_AUTO_DELETE = True
@@ -18,3 +26,136 @@ ENABLE_AUTO_MUTE = True
 ENABLE_AUTO_BAN = True
 # Logger group ka chat id (int me)
 LOGGER_CHAT_ID = -1003289105130 # yaha apna logger group ka chat id daalo, jaise -1001234567890
+
+# Admin roster cache (admin_bypass.is_admin_cached)
+ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", "300"))  # seconds
+ADMIN_CACHE_FAIL_TTL = int(os.getenv("ADMIN_CACHE_FAIL_TTL", "60"))  # roster fetch fail (bot not admin) itni der yaad
+ADMIN_CACHE_MAX_CHATS = int(os.getenv("ADMIN_CACHE_MAX_CHATS", "5000"))
+
+# Per-chat compiled rules cache (models.get_rules_text)
+RULES_CACHE_SIZE = int(os.getenv("RULES_CACHE_SIZE", "5000"))
+# load balancer ke peeche doosre process ka /setrule itni der me dikhega (SCALE_OUT me chat hamesha same process pe)
+RULES_CACHE_TTL = int(os.getenv("RULES_CACHE_TTL", "60"))  # seconds
+
+# Buffered audit log writer (log_sink.py)
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2"))  # seconds
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+LOG_ENQUEUE_TIMEOUT = float(os.getenv("LOG_ENQUEUE_TIMEOUT", "0.5"))  # seconds
+
+# Local pre-filter before Gemini (prefilter.py)
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "1") == "1"
+PREFILTER_TRIVIAL_MAX_LEN = int(os.getenv("PREFILTER_TRIVIAL_MAX_LEN", "24"))
+# comma separated, har group pe lagta hai
+GLOBAL_BLOCKLIST = [w.strip().casefold() for w in os.getenv("GLOBAL_BLOCKLIST", "").split(",") if w.strip()]
+# ek regex pattern, sirf operator config se (admins ke /setrule wale regex event loop atka sakte the)
+GLOBAL_BLOCK_REGEX = os.getenv("GLOBAL_BLOCK_REGEX", "").strip()
+
+# Verdict cache for repeated messages (verdict_cache.py)
+VERDICT_CACHE_TTL = int(os.getenv("VERDICT_CACHE_TTL", "3600"))  # seconds
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "20000"))
+# "1" = verdicts Mongo me bhi save honge, restart ke baad bhi milenge
+VERDICT_CACHE_PERSIST = os.getenv("VERDICT_CACHE_PERSIST", "0") == "1"
+
+# Retention for moderation_logs / appeals (models.ensure_indexes + archiver.py), 0 = forever
+MODERATION_LOG_RETENTION_DAYS = int(os.getenv("MODERATION_LOG_RETENTION_DAYS", "90"))
+APPEAL_RETENTION_DAYS = int(os.getenv("APPEAL_RETENTION_DAYS", "180"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")  # set ho to expire se pehle gzip JSONL segments yaha likhe jaate hain
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))  # seconds between archive runs
+ARCHIVE_GRACE_DAYS = int(os.getenv("ARCHIVE_GRACE_DAYS", "7"))  # archiver ke peeche TTL itne din baad delete karta hai
+ARCHIVE_SEGMENT_MAX = int(os.getenv("ARCHIVE_SEGMENT_MAX", "5000"))  # docs per segment file (itne hi ek baar memory me)
+
+# Hourly analytics rollups (analytics.py)
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "5"))  # seconds
+ANALYTICS_RETENTION_DAYS = int(os.getenv("ANALYTICS_RETENTION_DAYS", "400"))  # 0 = forever
+STATS_API_TOKEN = os.getenv("STATS_API_TOKEN", "")  # /stats/{chat_id} JSON endpoint; khaali = disabled
+
+# Write-behind users / groups registry (registry.py)
+REGISTRY_CACHE_SIZE = int(os.getenv("REGISTRY_CACHE_SIZE", "100000"))  # last-known entries per registry
+REGISTRY_FLUSH_INTERVAL = float(os.getenv("REGISTRY_FLUSH_INTERVAL", "5"))  # seconds
+REGISTRY_FLUSH_MAX = int(os.getenv("REGISTRY_FLUSH_MAX", "1000"))  # itne dirty hote hi turant flush
+
+# Micro-batched Gemini moderation (batcher.py)
+BATCH_ENABLED = os.getenv("BATCH_ENABLED", "0") == "1"  # opt-in: LLM calls ~5x kam, latency thodi zyada
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "10"))  # ek request me max messages
+BATCH_WINDOW_MS = int(os.getenv("BATCH_WINDOW_MS", "300"))  # itni der tak messages collect honge
+
+# Async Gemini client limits (moderation.generate_content_async)
+GEMINI_MAX_INFLIGHT = int(os.getenv("GEMINI_MAX_INFLIGHT", "16"))
+GEMINI_MAX_INFLIGHT_PER_CHAT = int(os.getenv("GEMINI_MAX_INFLIGHT_PER_CHAT", "4"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "20"))  # seconds per attempt
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "8"))
+
+# Tiered model routing (moderation.py): fast model pehle, doubtful / heavy verdicts strong model pe
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash-lite")
+GEMINI_STRONG_MODEL = os.getenv("GEMINI_STRONG_MODEL", "gemini-2.5-flash")
+ROUTING_ENABLED = os.getenv("ROUTING_ENABLED", "1") == "1"
+ROUTING_MIN_CONFIDENCE = float(os.getenv("ROUTING_MIN_CONFIDENCE", "0.75"))  # isse kam -> escalate
+ROUTING_ESCALATE_SEVERITY = int(os.getenv("ROUTING_ESCALATE_SEVERITY", "4"))  # itni ya zyada -> escalate
+
+# Moderation prompt budgets (prompt_builder.py), ~4 chars = 1 token
+PROMPT_RULES_TOKEN_BUDGET = int(os.getenv("PROMPT_RULES_TOKEN_BUDGET", "600"))
+PROMPT_RULE_MAX_TOKENS = int(os.getenv("PROMPT_RULE_MAX_TOKENS", "80"))  # ek rule ki max length
+PROMPT_MESSAGE_TOKEN_BUDGET = int(os.getenv("PROMPT_MESSAGE_TOKEN_BUDGET", "400"))
+
+# Sharded update workers (workers.py)
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))  # per worker
+UPDATE_SHUTDOWN_TIMEOUT = float(os.getenv("UPDATE_SHUTDOWN_TIMEOUT", "10"))  # seconds
+
+# Webhook ingress (ingress.py)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # set_webhook(secret_token=...) + header check
+UPDATE_DEDUP_WINDOW = int(os.getenv("UPDATE_DEDUP_WINDOW", "65536"))  # recent update_ids (1 bit each)
+INGRESS_SUBMIT_TIMEOUT = float(os.getenv("INGRESS_SUBMIT_TIMEOUT", "2"))  # queue full pe important updates itna wait
+
+# Persistent appeal / verification state (state_store.py)
+APPEAL_STATE_TTL = int(os.getenv("APPEAL_STATE_TTL", str(30 * 24 * 3600)))  # seconds
+VERIFY_STATE_TTL = int(os.getenv("VERIFY_STATE_TTL", str(2 * 24 * 3600)))  # seconds
+STATE_CACHE_TTL = float(os.getenv("STATE_CACHE_TTL", "5"))  # workers ke beech staleness limit
+STATE_CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", "10000"))
+
+# Multi-process scale-out (scaleout.py). 0/1 = single process mode
+SCALE_OUT_WORKERS = int(os.getenv("SCALE_OUT_WORKERS", "0"))
+SCALE_OUT_BROKER = os.getenv("SCALE_OUT_BROKER", "process")  # process | memory
+SCALE_OUT_QUEUE_SIZE = int(os.getenv("SCALE_OUT_QUEUE_SIZE", "10000"))  # per worker
+
+# Flood / spam shield (flood.py) - per chat /flood se override hota hai
+FLOOD_MAX_MESSAGES = int(os.getenv("FLOOD_MAX_MESSAGES", "6"))
+FLOOD_WINDOW = float(os.getenv("FLOOD_WINDOW", "5"))  # seconds
+FLOOD_MAX_DUPLICATES = int(os.getenv("FLOOD_MAX_DUPLICATES", "3"))  # same user, same text
+FLOOD_MAX_CHAT_DUPLICATES = int(os.getenv("FLOOD_MAX_CHAT_DUPLICATES", "5"))  # many users, same text
+FLOOD_DUP_WINDOW = float(os.getenv("FLOOD_DUP_WINDOW", "30"))  # seconds
+FLOOD_MAX_JOINS = int(os.getenv("FLOOD_MAX_JOINS", "10"))
+FLOOD_JOIN_WINDOW = float(os.getenv("FLOOD_JOIN_WINDOW", "60"))  # seconds
+FLOOD_MUTE_SECONDS = int(os.getenv("FLOOD_MUTE_SECONDS", "300"))
+FLOOD_MAX_TRACKED = int(os.getenv("FLOOD_MAX_TRACKED", "100000"))  # (chat, user) entries
+RAID_RESTRICT_CONCURRENCY = int(os.getenv("RAID_RESTRICT_CONCURRENCY", "8"))  # parallel restricts in a join raid
+RAID_EDIT_INTERVAL = float(os.getenv("RAID_EDIT_INTERVAL", "3"))  # rolling notice max ek edit itne seconds me
+RAID_NOTICE_TTL = int(os.getenv("RAID_NOTICE_TTL", "900"))  # seconds, phir notice delete
+CHAT_SETTINGS_CACHE_SIZE = int(os.getenv("CHAT_SETTINGS_CACHE_SIZE", "5000"))
+CHAT_SETTINGS_CACHE_TTL = int(os.getenv("CHAT_SETTINGS_CACHE_TTL", "60"))  # /flood, /routing changes across processes
+
+# Outbound Telegram API scheduler (outbound.py)
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))  # requests / second
+OUTBOUND_GROUP_PER_MIN = int(os.getenv("OUTBOUND_GROUP_PER_MIN", "20"))  # messages / minute per group
+OUTBOUND_PRIVATE_RATE = float(os.getenv("OUTBOUND_PRIVATE_RATE", "1"))  # messages / second per DM
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))  # RetryAfter retries
+OUTBOUND_MAX_CHATS = int(os.getenv("OUTBOUND_MAX_CHATS", "10000"))  # tracked chat buckets
+
+# Delayed deletion of bot notices (deletion_scheduler.py)
+DELETE_BATCH_MAX = int(os.getenv("DELETE_BATCH_MAX", "100"))
+
+
+def validate_config(raise_on_missing: bool = False):
+    missing = [
+        name for name, value in (
+            ("BOT_TOKEN", BOT_TOKEN),
+            ("GEMINI_API_KEY", GEMINI_API_KEY),
+            ("MONGO_URI", MONGO_URI),
+        ) if not value
+    ]
+    if missing and raise_on_missing:
+        raise RuntimeError(f"Missing config: {', '.join(missing)}")
+    return missing
@@ -1,12 +1,36 @@
 import os
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
-from config import MONGO_URI, DB_NAME
+from config import (
+    MONGO_URI,
+    DB_NAME,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_MS,
+    MONGO_TIMEOUT_MS,
+)
 
 load_dotenv()
 
 if not MONGO_URI:
     raise RuntimeError("MONGO_URI missing")
 
-mongo_client = MongoClient(MONGO_URI)
+# Motor client lazy hai: yaha koi network call nahi hota, pehla query event loop pe connect karega
+mongo_client = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGO_TIMEOUT_MS,
+)
 db = mongo_client[DB_NAME]
+
+
+async def ensure_connection():
+    await mongo_client.admin.command("ping")
+
+
+def close():
+    mongo_client.close()
@@ -0,0 +1,110 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import defaultdict
+
+from config import DELETE_BATCH_MAX
+
+logger = logging.getLogger(__name__)
+
+
+class DeletionScheduler:
+    """One background task deleting bot notices when due; entries persist in Mongo across restarts."""
+
+    def __init__(self, batch_max=DELETE_BATCH_MAX):
+        self.batch_max = min(100, batch_max)  # deleteMessages max 100 ids leta hai
+        self._heap = []  # (due_ts, chat_id, message_id)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._bot = None
+        self.stats = {"scheduled": 0, "deleted": 0, "failed_batches": 0, "persist_errors": 0}
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+    async def start(self, bot, owns=None):
+        from models import load_scheduled_deletions
+
+        self._bot = bot
+        # scale-out me har worker sirf apne chats ke entries uthata hai
+        async for chat_id, message_id, due_ts in load_scheduled_deletions():
+            if owns is None or owns(chat_id):
+                heapq.heappush(self._heap, (due_ts, chat_id, message_id))
+        if self._heap:
+            logger.info("Loaded %d pending message deletions", len(self._heap))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # pending entries Mongo me rehti hain, agle start pe wapas load hongi
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def schedule(self, chat_id: int, message_id: int, delay: float):
+        from models import add_scheduled_deletion
+
+        due_ts = time.time() + delay
+        # pehle persist, phir heap: warna chhote delay pe remove insert se pehle chal ke orphan chhod deta
+        try:
+            await add_scheduled_deletion(chat_id, message_id, due_ts)
+        except Exception as e:
+            self.stats["persist_errors"] += 1
+            logger.warning("Could not persist deletion of %s in %s: %s", message_id, chat_id, e)
+        heapq.heappush(self._heap, (due_ts, chat_id, message_id))
+        self.stats["scheduled"] += 1
+        if self._heap[0][0] == due_ts:
+            self._wakeup.set()
+
+    def _pop_due(self, now):
+        due = defaultdict(list)
+        while self._heap and self._heap[0][0] <= now:
+            _, chat_id, message_id = heapq.heappop(self._heap)
+            due[chat_id].append(message_id)
+        return due
+
+    async def _delete_batch(self, chat_id, message_ids):
+        try:
+            if len(message_ids) == 1:
+                await self._bot.delete_message(chat_id, message_ids[0])
+            else:
+                await self._bot.delete_messages(chat_id, message_ids)
+            self.stats["deleted"] += len(message_ids)
+        except Exception as e:
+            # message pehle hi delete / 48h purana -> retry ka fayda nahi
+            self.stats["failed_batches"] += 1
+            logger.debug("Delete of %d messages in %s failed: %s", len(message_ids), chat_id, e)
+
+    async def _run(self):
+        from models import remove_scheduled_deletions
+
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(time.time())
+            done = []
+            for chat_id, message_ids in due.items():
+                for i in range(0, len(message_ids), self.batch_max):
+                    chunk = message_ids[i:i + self.batch_max]
+                    await self._delete_batch(chat_id, chunk)
+                    done.extend((chat_id, m) for m in chunk)
+            try:
+                await remove_scheduled_deletions(done)
+            except Exception as e:
+                logger.warning("Could not clear %d fired deletions: %s", len(done), e)
+
+
+deletion_scheduler = DeletionScheduler()
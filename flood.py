@@ -0,0 +1,151 @@
+import time
+
+from lru import LRUCache
+from config import (
+    FLOOD_MAX_MESSAGES,
+    FLOOD_WINDOW,
+    FLOOD_MAX_DUPLICATES,
+    FLOOD_MAX_CHAT_DUPLICATES,
+    FLOOD_DUP_WINDOW,
+    FLOOD_MAX_JOINS,
+    FLOOD_JOIN_WINDOW,
+    FLOOD_MUTE_SECONDS,
+    FLOOD_MAX_TRACKED,
+)
+from prefilter import normalize
+
+DEFAULT_LIMITS = {
+    "enabled": True,
+    "messages": FLOOD_MAX_MESSAGES,
+    "window": FLOOD_WINDOW,
+    "duplicates": FLOOD_MAX_DUPLICATES,
+    "chat_duplicates": FLOOD_MAX_CHAT_DUPLICATES,
+    "dup_window": FLOOD_DUP_WINDOW,
+    "joins": FLOOD_MAX_JOINS,
+    "join_window": FLOOD_JOIN_WINDOW,
+    "mute_seconds": FLOOD_MUTE_SECONDS,
+}
+
+_CHAT_FINGERPRINTS = 64  # har chat me itne recent distinct texts track hote hain
+_CHAT_DUP_MIN_LEN = 12  # "gm" / "hi" jaise chhote texts bahut log bhejte hain, unhe raid mat samjho
+
+
+class SlidingWindow:
+    # do buckets wala sliding window: prev bucket ka bacha hua hissa + current bucket
+    __slots__ = ("start", "prev", "curr")
+
+    def __init__(self, now):
+        self.start = now
+        self.prev = 0
+        self.curr = 0
+
+    def hit(self, now, window, amount=1):
+        elapsed = now - self.start
+        if elapsed >= window:
+            # ek window aage -> curr prev ban jaata hai, do ya zyada -> dono reset
+            self.prev = self.curr if elapsed < 2 * window else 0
+            self.curr = 0
+            self.start += window * int(elapsed // window)
+            elapsed = now - self.start
+        self.curr += amount
+        return self.prev * (1 - elapsed / window) + self.curr
+
+
+class _UserState:
+    __slots__ = ("rate", "fp", "fp_count", "fp_seen", "muted_until")
+
+    def __init__(self, now):
+        self.rate = SlidingWindow(now)
+        self.fp = 0
+        self.fp_count = 0
+        self.fp_seen = 0.0
+        self.muted_until = 0.0
+
+
+class _ChatState:
+    __slots__ = ("joins", "raid_until", "fingerprints")
+
+    def __init__(self, now):
+        self.joins = SlidingWindow(now)
+        self.raid_until = 0.0
+        self.fingerprints = LRUCache(_CHAT_FINGERPRINTS)  # fp -> [count, first_seen]
+
+
+class FloodShield:
+    """In-memory flood detector: per-user rate + duplicate checks and per-chat join bursts."""
+
+    def __init__(self, max_tracked=FLOOD_MAX_TRACKED):
+        self.max_tracked = max_tracked
+        self._users = LRUCache(max_tracked)  # (chat_id, user_id) -> _UserState
+        self._chats = LRUCache(max_tracked)  # chat_id -> _ChatState
+        self.stats = {"checked": 0, "rate": 0, "duplicate": 0, "chat_duplicate": 0, "join_bursts": 0}
+
+    def check_message(self, chat_id, user_id, text, limits=None, now=None):
+        """Returns a reason string when the message is flood, else None."""
+        limits = limits or DEFAULT_LIMITS
+        if not limits["enabled"]:
+            return None
+        now = time.monotonic() if now is None else now
+        self.stats["checked"] += 1
+
+        user = self._users.get_or_create((chat_id, user_id), lambda: _UserState(now))
+        if user.muted_until > now:
+            return "flood (already muted)"
+
+        if user.rate.hit(now, limits["window"]) > limits["messages"]:
+            self.stats["rate"] += 1
+            return f"flood: more than {limits['messages']} messages in {limits['window']}s"
+
+        if not text:
+            return None
+        norm = normalize(text)
+        fp = hash(norm)
+
+        if fp == user.fp and now - user.fp_seen <= limits["dup_window"]:
+            user.fp_count += 1
+        else:
+            user.fp, user.fp_count = fp, 1
+        user.fp_seen = now
+        if user.fp_count > limits["duplicates"]:
+            self.stats["duplicate"] += 1
+            return f"flood: same message repeated {user.fp_count} times"
+
+        if len(norm) < _CHAT_DUP_MIN_LEN:
+            return None
+        chat = self._chats.get_or_create(chat_id, lambda: _ChatState(now))
+        seen = chat.fingerprints.get(fp)
+        if seen is None or now - seen[1] > limits["dup_window"]:
+            seen = chat.fingerprints.set(fp, [0, now])
+        seen[0] += 1
+        if seen[0] > limits["chat_duplicates"]:
+            self.stats["chat_duplicate"] += 1
+            return "flood: same message posted by many users"
+        return None
+
+    def mark_muted(self, chat_id, user_id, seconds, now=None):
+        now = time.monotonic() if now is None else now
+        self._users.get_or_create((chat_id, user_id), lambda: _UserState(now)).muted_until = now + seconds
+
+    def record_join(self, chat_id, count=1, limits=None, now=None) -> bool:
+        """Counts joins; returns True when the chat is in a join burst (raid)."""
+        limits = limits or DEFAULT_LIMITS
+        if not limits["enabled"]:
+            return False
+        now = time.monotonic() if now is None else now
+        chat = self._chats.get_or_create(chat_id, lambda: _ChatState(now))
+        if chat.joins.hit(now, limits["join_window"], count) > limits["joins"]:
+            if chat.raid_until <= now:
+                self.stats["join_bursts"] += 1
+            chat.raid_until = now + limits["join_window"]
+        return chat.raid_until > now
+
+    def in_raid(self, chat_id, now=None) -> bool:
+        chat = self._chats.get(chat_id)
+        now = time.monotonic() if now is None else now
+        return chat is not None and chat.raid_until > now
+
+    def tracked(self):
+        return {"users": len(self._users), "chats": len(self._chats)}
+
+
+flood_shield = FloodShield()
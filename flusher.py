@@ -0,0 +1,54 @@
+import asyncio
+
+
+class PeriodicFlusher:
+    """Runs flush() every flush_interval (or earlier on wake()) in one background task.
+
+    Subclass flush() implement karti hai. stop() cancel nahi karta, warna beech ke write wale
+    changes kho jaate; loop khud nikalta hai aur phir ek last flush hota hai.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def flush(self):
+        raise NotImplementedError
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def flush_if_idle(self) -> bool:
+        # background task ke bina (CLI scripts, stop() ke baad) pending data turant flush
+        if self.running:
+            return False
+        await self.flush()
+        return True
+
+    def start(self):
+        if not self.running:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.running:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+        self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
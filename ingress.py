@@ -0,0 +1,92 @@
+import hmac
+import json
+
+try:
+    import orjson  # optional: bade updates pe json se kaafi tez
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from config import UPDATE_DEDUP_WINDOW
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def loads(body: bytes):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def check_secret(received, expected) -> bool:
+    # secret set nahi hai to check off; compare_digest timing se secret leak nahi karta
+    if not expected:
+        return True
+    if received is None:
+        return False
+    return hmac.compare_digest(received.encode("utf-8"), expected.encode("utf-8"))
+
+
+class UpdateIdFilter:
+    """Drops Telegram retries: bitset of the last `window` update_ids (1 bit each).
+
+    update_id badhte hue aate hain, isliye ek sliding window kaafi hai. Window se peeche
+    ka akela id (late retry, purane webhook ka) duplicate maana jaata hai; lagatar do aise
+    paas-paas ke ids sequence reset hain (Telegram ek hafte idle ke baad random naya
+    update_id chunta hai), tab filter wahi se dobara seed hota hai.
+    """
+
+    def __init__(self, window=UPDATE_DEDUP_WINDOW):
+        self.window = max(8, window - window % 8)
+        self._bits = bytearray(self.window // 8)
+        self._high = None  # sabse bada dekha hua update_id
+        self._stale = None  # pichla window se bahar wala id
+        self.resets = 0
+
+    def _clear(self, start, end):
+        # (start, end] range ke bits reset, naye ids ke liye jagah
+        if end - start >= self.window:
+            self._bits = bytearray(self.window // 8)
+            return
+        for uid in range(start + 1, end + 1):
+            idx = uid % self.window
+            self._bits[idx >> 3] &= ~(1 << (idx & 7)) & 0xFF
+
+    def seen(self, update_id: int) -> bool:
+        """Marks update_id and returns True if it was already seen."""
+        if self._high is not None and update_id <= self._high - self.window:
+            stale, self._stale = self._stale, update_id
+            if stale is None or update_id == stale or abs(update_id - stale) >= self.window:
+                return True
+            # doosra paas wala purana id: naya sequence, warna restart tak sab drop hota
+            self._bits = bytearray(self.window // 8)
+            self._high = max(stale, update_id)
+            self._mark(stale)
+            self.resets += 1
+        self._stale = None
+
+        if self._high is None:
+            self._high = update_id
+        elif update_id > self._high:
+            self._clear(self._high, update_id)
+            self._high = update_id
+
+        return self._mark(update_id)
+
+    def _mark(self, update_id) -> bool:
+        idx = update_id % self.window
+        byte, mask = idx >> 3, 1 << (idx & 7)
+        if self._bits[byte] & mask:
+            return True
+        self._bits[byte] |= mask
+        return False
+
+
+def is_sheddable(update) -> bool:
+    # overload me sirf plain group chatter drop hota hai; joins, buttons, commands, DMs, member changes nahi
+    message = update.message or update.edited_message
+    if message is None:
+        return False
+    if message.chat.type == "private" or message.new_chat_members or message.left_chat_member:
+        return False
+    text = message.text or ""
+    return not text.startswith("/")
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+from pymongo.errors import BulkWriteError
+
+from db import db
+from metrics import MONGO_SECONDS, MONGO_ERRORS
+from config import LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_QUEUE_MAX, LOG_ENQUEUE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class LogSink:
+    """Buffers audit inserts and writes them with insert_many in the background."""
+
+    def __init__(self, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL,
+                 max_queue=LOG_QUEUE_MAX, enqueue_timeout=LOG_ENQUEUE_TIMEOUT):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self.stats = {"queued": 0, "written": 0, "requeued": 0, "dropped": 0, "flushes": 0, "errors": 0}
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        # sentinel queue ke end me jaata hai, isliye pehle ka sab flush hoke hi task exit karega
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, collection: str, doc: dict):
+        if not self.running:
+            # sink start nahi hua (scripts / shutdown ke baad) -> seedha likho
+            await db[collection].insert_one(doc)
+            return
+
+        try:
+            self._queue.put_nowait((collection, doc))
+        except asyncio.QueueFull:
+            # bounded backpressure: thoda ruko, phir bhi jagah nahi mili to record drop
+            try:
+                await asyncio.wait_for(self._queue.put((collection, doc)), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["dropped"] += 1
+                logger.warning("Log sink full, dropped %s record", collection)
+                return
+        self.stats["queued"] += 1
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        item = await self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _requeue(self, collection, docs):
+        # buffer cap tak hi wapas; pymongo ne _id pehli koshish me hi set kar diya tha,
+        # isliye jo asal me likh gaya tha wo retry pe duplicate key deta hai aur skip hota hai
+        for doc in docs:
+            try:
+                self._queue.put_nowait((collection, doc))
+                self.stats["requeued"] += 1
+            except asyncio.QueueFull:
+                self.stats["dropped"] += 1
+
+    async def _flush(self, batch, requeue=True):
+        grouped = defaultdict(list)
+        for collection, doc in batch:
+            grouped[collection].append(doc)
+
+        failed = False
+        for collection, docs in grouped.items():
+            start = time.perf_counter()
+            try:
+                await db[collection].insert_many(docs, ordered=False)
+                self.stats["written"] += len(docs)
+            except Exception as e:
+                failed = True
+                self.stats["errors"] += 1
+                MONGO_ERRORS.inc(op="insert_many")
+                retry = docs
+                if isinstance(e, BulkWriteError):
+                    # unordered: baaki docs insert ho chuke; duplicate key (11000) = pehle hi likha tha
+                    errors = e.details.get("writeErrors", [])
+                    retry = [docs[err["index"]] for err in errors if err.get("code") != 11000]
+                    self.stats["written"] += len(docs) - len(errors)
+                logger.error("Log sink flush to %s failed (%d docs, %d to retry): %s",
+                             collection, len(docs), len(retry), e)
+                if requeue:
+                    self._requeue(collection, retry)
+                else:
+                    self.stats["dropped"] += len(retry)
+            MONGO_SECONDS.observe(time.perf_counter() - start, op="insert_many")
+        self.stats["flushes"] += 1
+        return not failed
+
+    async def _run(self):
+        while True:
+            batch, stopping = await self._collect()
+            ok = True
+            if batch:
+                # stop ke baad queue koi nahi padhega, wapas daalna bekaar
+                ok = await self._flush(batch, requeue=not stopping)
+            if stopping:
+                return
+            if not ok:
+                # Mongo down ho to requeued batch pe tight retry loop mat chalao
+                await asyncio.sleep(self.flush_interval)
+
+
+log_sink = LogSink()
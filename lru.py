@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache:
+    """Size-capped mapping in LRU order with an optional per-entry TTL.
+
+    get() hit pe entry ko end pe le jaata hai; set() ke baad sabse purani entries evict.
+    ttl None ho to entries sirf size se nikalti hain.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at | None, value), oldest first
+
+    def get(self, key, default=None, now=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[0] is not None and entry[0] <= (time.monotonic() if now is None else now):
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value, ttl=None, now=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else (time.monotonic() if now is None else now) + ttl
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return value
+
+    def get_or_create(self, key, factory):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            value = self.set(key, factory())
+        return value
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -6,6 +6,7 @@ import random
 from datetime import timedelta, datetime
 
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 
 from telegram import (
@@ -20,6 +21,8 @@ from telegram.ext import (
     MessageHandler,
     ContextTypes,
     CallbackQueryHandler,
+    ChatMemberHandler,
+    ApplicationHandlerStop,
     filters,
 )
 from telegram.constants import ParseMode
@@ -37,6 +40,13 @@ from config import (
     ENABLE_AUTO_DELETE,
     ENABLE_AUTO_MUTE,
     LOGGER_CHAT_ID,
+    APPEAL_STATE_TTL,
+    VERIFY_STATE_TTL,
+    SCALE_OUT_WORKERS,
+    OUTBOUND_GLOBAL_RATE,
+    WEBHOOK_SECRET,
+    INGRESS_SUBMIT_TIMEOUT,
+    STATS_API_TOKEN,
     validate_config,
 )
 
@@ -46,23 +56,47 @@ from models import (
     add_user,
     add_rule_db,
     get_rules_db,
+    get_rules_text,
     increment_warning,
     reset_warnings,
     get_all_warnings,
     log_action,
     log_appeal,
+    get_chat_settings,
+    update_chat_settings,
     ensure_indexes,
 )
 from db import ensure_connection, close as close_db
-
-# ---------- MODERATION (blocking helpers used in executor) ----------
-from moderation import (
-    moderate_message_sync as moderate_message,
-    evaluate_appeal_sync as evaluate_appeal,
+from log_sink import log_sink
+from registry import users_registry, groups_registry
+from archiver import archiver
+from analytics import rollups
+from workers import ShardedDispatcher
+from state_store import StateStore
+from scaleout import ScaleOut
+from flood import flood_shield, DEFAULT_LIMITS as FLOOD_DEFAULTS
+from outbound import OutboundRateLimiter, PRIORITY_LOW
+from deletion_scheduler import deletion_scheduler
+from raid_welcome import raid_welcome, restrict_many
+from ingress import loads, check_secret, UpdateIdFilter, is_sheddable, SECRET_HEADER
+import prefilter
+from verdict_cache import verdict_cache
+from metrics import (
+    instrument,
+    render as render_metrics,
+    Gauge,
+    StatsCollector,
+    WEBHOOK_SECONDS,
+    HANDLER_SECONDS,
+    HANDLER_ERRORS,
 )
 
+# ---------- MODERATION ----------
+from moderation import moderate_message, evaluate_appeal, moderation_batcher, llm_stats, tier_stats, ROUTING_DEFAULTS
+from prompt_builder import prompt_stats
+
 # ---------- ADMIN BYPASS ----------
-from admin_bypass import is_admin_cached as is_admin
+from admin_bypass import is_admin_cached as is_admin, invalidate_admins, ADMIN_STATUSES, admin_cache_stats
 
 # ---------- APPROVALS ----------
 # approvals.py must provide: approve_cmd, unapprove_cmd, unapprove_all_cmd, should_moderate
@@ -83,10 +117,11 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # ---------- GLOBAL STATE ----------
-pending_appeals = {}
-appeal_attempt_counts = {}
-appeal_approved_counts = {}
-pending_verifications = {}
+# Mongo-backed (TTL) taaki restart / multiple workers me bhi state same rahe
+pending_appeals = StateStore("pending_appeals", APPEAL_STATE_TTL)
+appeal_attempt_counts = StateStore("appeal_attempt_counts", APPEAL_STATE_TTL)
+appeal_approved_counts = StateStore("appeal_approved_counts", APPEAL_STATE_TTL)
+pending_verifications = StateStore("pending_verifications", VERIFY_STATE_TTL)
 
 # ---------- FASTAPI + TELEGRAM APP ----------
 if not BOT_TOKEN:
@@ -99,15 +134,59 @@ if not WEBHOOK_HOST:
 WEBHOOK_PATH = f"/webhook/{BOT_TOKEN}"
 WEBHOOK_URL = f"{WEBHOOK_HOST}{WEBHOOK_PATH}"
 
-application = Application.builder().token(BOT_TOKEN).build()
+# saari Bot API calls central scheduler se: token buckets + priority + RetryAfter retries
+application = Application.builder().token(BOT_TOKEN).rate_limiter(OutboundRateLimiter()).build()
 app = FastAPI()
 
+# chat_id ke hisaab se sharded workers: ek chat ka slow Gemini call doosre groups ko nahi rokta
+dispatcher = ShardedDispatcher(application.process_update)
+# batch window tabhi hold ho jab doosre shards pe messages queue me hon
+moderation_batcher.backlog = dispatcher.waiting_elsewhere
+
+# webhook ingress: Telegram retries ka dedupe + load shedding counters
+update_filter = UpdateIdFilter()
+ingress_stats = {"received": 0, "duplicates": 0, "shed": 0, "bad_secret": 0, "bad_json": 0}
+
+# SCALE_OUT_WORKERS > 1: ye process sirf ingress hai, updates chat_id se worker processes me jaate hain
+scale_out = ScaleOut(SCALE_OUT_WORKERS) if SCALE_OUT_WORKERS > 1 else None
+
+# ---------- METRICS (scrape time pe module stats padhe jaate hain) ----------
+Gauge("update_queue_depth", "Updates waiting in worker queues",
+      fn=lambda: dispatcher.depth() + (scale_out.depth() if scale_out else 0))
+Gauge("outbound_queue_depth", "Bot API calls waiting for a rate-limit token",
+      fn=lambda: application.bot.rate_limiter.queue_depth())
+StatsCollector("admin_cache", admin_cache_stats, kind="counter", gauges=("chats",))
+StatsCollector("telegram_api", lambda: application.bot.rate_limiter.stats, kind="counter")
+StatsCollector("gemini", llm_stats, kind="counter", gauges=("in_flight", "limit", "active_chats"))
+StatsCollector("prefilter", prefilter.prefilter_stats, kind="counter")
+StatsCollector("prompt", prompt_stats, kind="counter", gauges=("rules_blocks",))
+StatsCollector("moderation_tier", tier_stats, kind="counter")
+StatsCollector("verdict_cache", lambda: verdict_cache.stats, kind="counter")
+StatsCollector("moderation_batcher", lambda: moderation_batcher.stats, kind="counter")
+StatsCollector("log_sink", lambda: {**log_sink.stats, "depth": log_sink.depth()}, kind="counter", gauges=("depth",))
+StatsCollector("users_registry", lambda: {**users_registry.stats, "dirty": users_registry.dirty()},
+               kind="counter", gauges=("dirty",))
+StatsCollector("groups_registry", lambda: {**groups_registry.stats, "dirty": groups_registry.dirty()},
+               kind="counter", gauges=("dirty",))
+StatsCollector("flood", lambda: {**flood_shield.stats, **flood_shield.tracked()}, kind="counter", gauges=("users", "chats"))
+StatsCollector("raid_welcome", lambda: {**raid_welcome.stats, "active": raid_welcome.active()},
+               kind="counter", gauges=("active",))
+StatsCollector("deletions", lambda: {**deletion_scheduler.stats, "pending": deletion_scheduler.pending()},
+               kind="counter", gauges=("pending",))
+StatsCollector("updates", lambda: dispatcher.stats, kind="counter")
+StatsCollector("archiver", lambda: archiver.stats, kind="counter")
+StatsCollector("analytics", lambda: rollups.stats, kind="counter")
+StatsCollector("ingress", lambda: {**ingress_stats, "id_resets": update_filter.resets}, kind="counter")
+
 
 # ---------- HELPERS ----------
+# cosmetic notices (temp messages, logger, welcome) bans/deletes ke baad jaate hain
+LOW_PRIORITY = {"priority": PRIORITY_LOW}
+
 async def log_to_logger(text: str, bot):
     if LOGGER_CHAT_ID:
         try:
-            await bot.send_message(LOGGER_CHAT_ID, text)
+            await bot.send_message(LOGGER_CHAT_ID, text, rate_limit_args=LOW_PRIORITY)
         except Exception:
             pass
 
@@ -130,18 +209,41 @@ async def send_temp_message(chat, text: str, seconds: int = 180, style: str = "n
     else:
         formatted = text
 
+    bot = chat.get_bot()
     try:
-        msg = await chat.send_message(formatted, parse_mode=ParseMode.HTML)
+        msg = await bot.send_message(chat.id, formatted, parse_mode=ParseMode.HTML, rate_limit_args=LOW_PRIORITY)
     except Exception:
-        msg = await chat.send_message(text)
+        msg = await bot.send_message(chat.id, text, rate_limit_args=LOW_PRIORITY)
+
+    # sleeping task ki jagah ek central (persisted) scheduler delete karega
+    await deletion_scheduler.schedule(msg.chat_id, msg.message_id, seconds)
+
 
+async def _flood_limits(chat_id: int):
+    settings = await get_chat_settings(chat_id)
+    custom = settings.get("flood")
+    return {**FLOOD_DEFAULTS, **custom} if custom else FLOOD_DEFAULTS
+
+
+async def _routing_settings(chat_id: int):
+    settings = await get_chat_settings(chat_id)
+    custom = settings.get("routing")
+    return {**ROUTING_DEFAULTS, **custom} if custom else ROUTING_DEFAULTS
+
+
+async def _notify_user(bot, user_id: int, text: str):
+    # DM ka private chat bucket 1 msg/s hai, isliye handlers ise dispatcher.detach se bhejte hain
     try:
-        await asyncio.sleep(seconds)
-        await msg.delete()
+        await bot.send_message(user_id, text, parse_mode=ParseMode.HTML)
     except Exception:
         pass
 
 
+async def _shared_batching(chat_id: int) -> bool:
+    settings = await get_chat_settings(chat_id)
+    return bool((settings.get("batching") or {}).get("shared"))
+
+
 async def _is_admin_from_update(update, context):
     try:
         chat = update.effective_chat
@@ -152,17 +254,18 @@ async def _is_admin_from_update(update, context):
 
 
 # ---------- START ----------
+@instrument(HANDLER_SECONDS, HANDLER_ERRORS, handler="start")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     chat = update.effective_chat
     bot = context.bot
 
-    add_user(user.id, user.username or user.first_name)
+    await add_user(user.id, user.username or user.first_name)
 
     await log_to_logger(f"🔹 /start used by {user.first_name} (id={user.id}) in chat {chat.id} ({chat.type})", bot)
 
     if chat.type != "private":
-        add_group(chat.id, chat.title, user.id)
+        await add_group(chat.id, chat.title, user.id)
         return await update.message.reply_text(
             "🤖 <b>AI Moderator Active</b>\n\nUse /setrule to add rules.",
             parse_mode=ParseMode.HTML,
@@ -191,7 +294,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
 
         key = (group_id, user.id)
-        msg_id = pending_verifications.pop(key, None)
+        msg_id = await pending_verifications.pop(key)
         if msg_id:
             try:
                 await bot.delete_message(group_id, msg_id)
@@ -201,7 +304,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("✅ <b>Successfully verified!</b>\n\nAb aap group me freely chat kar sakte ho.", parse_mode=ParseMode.HTML)
 
         try:
-            await bot.send_message(group_id, f"✨ <b>{user.first_name} ɪꜱ ᴠᴇʀɪꜰɪᴇᴅ ᴀɴᴅ ᴜɴᴍᴜᴛᴇᴅ! 🍷</b>", parse_mode=ParseMode.HTML)
+            await bot.send_message(group_id, f"✨ <b>{user.first_name} ɪꜱ ᴠᴇʀɪꜰɪᴇᴅ ᴀɴᴅ ᴜɴᴍᴜᴛᴇᴅ! 🍷</b>", parse_mode=ParseMode.HTML, rate_limit_args=LOW_PRIORITY)
         except Exception:
             pass
 
@@ -211,6 +314,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # ---------- WELCOME NEW MEMBER ----------
+@instrument(HANDLER_SECONDS, HANDLER_ERRORS, handler="welcome_new_member")
 async def welcome_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message = update.effective_message
     chat = update.effective_chat
@@ -220,26 +324,33 @@ async def welcome_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if not new_members:
         return
 
-    bot_user = await bot.get_me()
-    bot_username = bot_user.username
+    # bot identity initialize() pe ek baar get_me se aa jaati hai, har join pe dobara nahi
+    bot_id, bot_username = bot.id, bot.username
+    verify_link = f"https://t.me/{bot_username}?start=verify_{chat.id}"
 
-    for member in new_members:
-        if member.id == bot_user.id:
-            await log_to_logger(f"✅ Bot added to group: {chat.title} (id={chat.id})", bot)
-            continue
+    if any(m.id == bot_id for m in new_members):
+        await log_to_logger(f"✅ Bot added to group: {chat.title} (id={chat.id})", bot)
 
-        if member.is_bot:
-            continue
+    humans = [m for m in new_members if not m.is_bot]
+    if not humans:
+        return
 
-        add_user(member.id, member.username or member.first_name)
+    if flood_shield.record_join(chat.id, len(humans), limits=await _flood_limits(chat.id)):
+        # raid: parallel restricts + ek rolling notice, per-member welcome nahi
+        await asyncio.gather(*(add_user(m.id, m.username or m.first_name) for m in humans))
+        restricted = await restrict_many(bot, chat.id, [m.id for m in humans])
+        if restricted:
+            await raid_welcome.add(bot, chat.id, restricted, verify_link)
+        return
+
+    for member in humans:
+        await add_user(member.id, member.username or member.first_name)
 
         try:
             await bot.restrict_chat_member(chat.id, member.id, permissions=ChatPermissions(can_send_messages=False))
         except Exception:
             pass
 
-        verify_link = f"https://t.me/{bot_username}?start=verify_{chat.id}"
-
         welcome_html = f"""
 👋 <b>WELCOME {member.first_name.upper()}!</b> 👋
 
@@ -255,12 +366,18 @@ async def welcome_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 disable_web_page_preview=True,
                 reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("✅ VERIFY NOW", url=verify_link)]]),
             )
-            pending_verifications[(chat.id, member.id)] = sent.message_id
+            await pending_verifications.set((chat.id, member.id), sent.message_id)
         except Exception:
             pass
 
 
 # ---------- RULES COMMANDS ----------
+SETRULE_USAGE = (
+    "<code>Usage: /setrule &lt;rule&gt;</code>\n\n"
+    "• <code>/setrule No promotion or links</code> - the AI moderates by this rule\n"
+    "• <code>/setrule block: casino, bet365</code> - messages with these words are deleted instantly"
+)
+
 async def setrule(update, context):
     if not await _is_admin_from_update(update, context):
         return await update.message.reply_text("<code>Admin only.</code>", parse_mode=ParseMode.HTML)
@@ -269,18 +386,25 @@ async def setrule(update, context):
     text = " ".join(context.args)
 
     if not text:
-        return await update.message.reply_text("<code>Usage: /setrule &lt;rule&gt;</code>", parse_mode=ParseMode.HTML)
+        return await update.message.reply_text(SETRULE_USAGE, parse_mode=ParseMode.HTML)
 
-    add_rule_db(chat_id, text)
+    await add_rule_db(chat_id, text)
 
-    rules = get_rules_db(chat_id)
+    rules = await get_rules_db(chat_id)
     rr = "\n".join([f"{i+1}. {r}" for i, r in enumerate(rules)])
 
+    kind = prefilter.rule_kind(text)
+    note = ""
+    if kind == "block":
+        note = "\n🚫 <i>Messages with these words are deleted instantly.</i>\n"
+    elif kind == "regex":
+        note = "\n⚠️ <i>Regex filters can only be set by the bot owner; this rule is given to the AI as plain text.</i>\n"
+
     response_html = f"""
 ✅ <b>RULE ADDED SUCCESSFULLY!</b>
 
 <blockquote>{text}</blockquote>
-
+{note}
 📋 <b>ALL RULES:</b>
 <pre>{rr}</pre>
     """
@@ -289,18 +413,22 @@ async def setrule(update, context):
 
 
 async def show_rules(update, context):
-    rules = get_rules_db(update.effective_chat.id)
+    rules = await get_rules_db(update.effective_chat.id)
     if not rules:
         return await update.message.reply_text("<i>No rules set for this group.</i>", parse_mode=ParseMode.HTML)
 
     rr = "\n".join([f"{i+1}. {r}" for i, r in enumerate(rules)])
 
+    blocked = ""
+    if any(prefilter.rule_kind(r) == "block" for r in rules):
+        blocked = "🚫 <i>Words listed after block: are deleted automatically.</i>\n"
+
     rules_html = f"""
 📜 <b>GROUP RULES</b> 📜
 
 <pre>{rr}</pre>
 
-<i>Please follow these rules to avoid moderation actions.</i>
+{blocked}<i>Please follow these rules to avoid moderation actions.</i>
     """
 
     await update.message.reply_text(rules_html, parse_mode=ParseMode.HTML)
@@ -311,7 +439,7 @@ async def status(update, context):
         return await update.message.reply_text("<code>Admin only.</code>", parse_mode=ParseMode.HTML)
 
     chat_id = update.effective_chat.id
-    warns = get_all_warnings(chat_id)
+    warns = await get_all_warnings(chat_id)
 
     if not warns:
         return await update.message.reply_text("<i>No warnings.</i>", parse_mode=ParseMode.HTML)
@@ -323,7 +451,40 @@ async def status(update, context):
     await update.message.reply_text(msg, parse_mode=ParseMode.HTML)
 
 
+STATS_MAX_HOURS = 24 * 30
+
+
+async def stats_cmd(update, context):
+    if not await _is_admin_from_update(update, context):
+        return await update.message.reply_text("<code>Admin only.</code>", parse_mode=ParseMode.HTML)
+
+    try:
+        hours = int(context.args[0]) if context.args else 24
+        if not 1 <= hours <= STATS_MAX_HOURS:
+            raise ValueError
+    except ValueError:
+        return await update.message.reply_text(f"<code>Usage: /stats [hours 1-{STATS_MAX_HOURS}]</code>", parse_mode=ParseMode.HTML)
+
+    summary = await rollups.summary(update.effective_chat.id, hours)
+    if not summary["total"]:
+        return await update.message.reply_text(f"<i>No moderation actions in the last {hours}h.</i>", parse_mode=ParseMode.HTML)
+
+    actions = "\n".join(f"{a}: {n}" for a, n in summary["actions"].items())
+    categories = "\n".join(f"{c}: {n}" for c, n in list(summary["categories"].items())[:5])
+    busiest = max(summary["hourly"].items(), key=lambda kv: kv[1])
+
+    await update.message.reply_text(
+        f"📊 <b>MODERATION STATS ({hours}h)</b>\n\n"
+        f"<b>Total actions:</b> {summary['total']}\n\n"
+        f"<b>By action:</b>\n<pre>{actions}</pre>\n"
+        f"<b>Top categories:</b>\n<pre>{categories}</pre>\n"
+        f"<b>Busiest hour (UTC):</b> <code>{busiest[0][:13]}:00</code> ({busiest[1]})",
+        parse_mode=ParseMode.HTML,
+    )
+
+
 # ---------- APPEAL SYSTEM ----------
+@instrument(HANDLER_SECONDS, HANDLER_ERRORS, handler="appeal")
 async def appeal(update, context):
     chat = update.effective_chat
     user = update.effective_user
@@ -333,32 +494,29 @@ async def appeal(update, context):
     if chat.type != "private":
         return await update.message.reply_text("<code>DM me /appeal bhejo.</code>", parse_mode=ParseMode.HTML)
 
-    if user_id not in pending_appeals or not pending_appeals[user_id]:
+    group_ids = await pending_appeals.get(user_id)
+    if not group_ids:
         return await update.message.reply_text("<i>No active ban/mute appeal found.</i>", parse_mode=ParseMode.HTML)
 
     appeal_text = " ".join(context.args)
     if not appeal_text:
         return await update.message.reply_text("<code>Usage: /appeal &lt;reason&gt;</code>", parse_mode=ParseMode.HTML)
 
-    group_ids = list(pending_appeals[user_id])
-
-    attempt_count = appeal_attempt_counts.get(user_id, 0) + 1
-    appeal_attempt_counts[user_id] = attempt_count
+    attempt_count = await appeal_attempt_counts.incr(user_id)
 
-    approved_count = appeal_approved_counts.get(user_id, 0)
+    approved_count = await appeal_approved_counts.get(user_id, 0)
 
-    # AI AUTO-HANDLING -- run evaluate_appeal in executor (blocking)
+    # AI AUTO-HANDLING
     decision = {}
     try:
-        loop = asyncio.get_running_loop()
-        decision = await loop.run_in_executor(None, evaluate_appeal, appeal_text)
+        decision = await evaluate_appeal(appeal_text)
     except Exception as e:
         print("evaluate_appeal failed:", e)
         decision = {"approve": False, "reason": "AI error"}
 
     if approved_count < 3 and decision.get("approve"):
         for gid in group_ids:
-            log_appeal(user_id, gid, appeal_text, True)
+            await log_appeal(user_id, gid, appeal_text, True)
             try:
                 await context.bot.unban_chat_member(gid, user_id)
             except Exception:
@@ -368,7 +526,7 @@ async def appeal(update, context):
             except Exception:
                 pass
 
-        appeal_approved_counts[user_id] = approved_count + 1
+        await appeal_approved_counts.incr(user_id)
 
         await update.message.reply_text(
             "✅ <b>Appeal Approved!</b>\n\n" "Aap sabhi groups me unbanned/unmuted ho gaye ho.",
@@ -382,8 +540,8 @@ async def appeal(update, context):
             except Exception:
                 pass
 
-        pending_appeals.pop(user_id, None)
-        appeal_attempt_counts.pop(user_id, None)
+        await pending_appeals.delete(user_id)
+        await appeal_attempt_counts.delete(user_id)
         return
 
     # Admin review path...
@@ -438,7 +596,7 @@ async def approve_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("<code>Invalid approval data.</code>", parse_mode=ParseMode.HTML)
         return
 
-    group_ids = list(pending_appeals.get(user_id, []))
+    group_ids = await pending_appeals.get(user_id, [])
 
     for gid in group_ids:
         try:
@@ -446,9 +604,9 @@ async def approve_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except Exception:
             pass
 
-    pending_appeals.pop(user_id, None)
-    appeal_attempt_counts.pop(user_id, None)
-    appeal_approved_counts.pop(user_id, None)
+    await pending_appeals.delete(user_id)
+    await appeal_attempt_counts.delete(user_id)
+    await appeal_approved_counts.delete(user_id)
 
     try:
         await context.bot.send_message(user_id, "✅ <b>Your appeal was approved by admin.</b>\n\nYou can now rejoin the group(s).", parse_mode=ParseMode.HTML)
@@ -461,7 +619,148 @@ async def approve_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         pass
 
 
+# ---------- FLOOD SHIELD ----------
+async def flood_guard(update, context):
+    message = update.effective_message
+    chat = update.effective_chat
+    user = update.effective_user
+
+    if not message or not user or chat.type == "private" or user.is_bot:
+        return
+
+    limits = await _flood_limits(chat.id)
+    reason = flood_shield.check_message(chat.id, user.id, message.text or message.caption, limits=limits)
+    if reason is None:
+        return
+
+    # approved users handle_message me bhi skip hote hain, flood shield bhi unhe na chhede
+    try:
+        if not should_moderate(chat.id, user.id):
+            return
+    except Exception:
+        pass
+
+    # admin check sirf flood hit hone pe (cached roster), normal messages pe nahi
+    if await _is_admin_from_update(update, context):
+        return
+
+    try:
+        await message.delete()
+    except Exception:
+        pass
+
+    # already muted user ke baaki messages sirf delete, dobara mute/notice nahi
+    if not reason.endswith("(already muted)"):
+        mute_seconds = limits["mute_seconds"]
+        flood_shield.mark_muted(chat.id, user.id, mute_seconds)
+        try:
+            await chat.restrict_member(
+                user.id,
+                ChatPermissions(can_send_messages=False),
+                until_date=datetime.utcnow() + timedelta(seconds=mute_seconds),
+            )
+        except Exception:
+            pass
+
+        await log_action(chat.id, user.id, "flood_mute", reason, category="flood")
+        asyncio.create_task(send_temp_message(
+            chat,
+            f"🌊 <b>{user.first_name}</b> muted for {mute_seconds // 60 or 1} min\n<code>{reason}</code>",
+            seconds=60,
+            style="warning",
+        ))
+
+    # LLM moderation tak ye message nahi jaayega
+    raise ApplicationHandlerStop
+
+
+async def flood_cmd(update, context):
+    if not await _is_admin_from_update(update, context):
+        return await update.message.reply_text("<code>Admin only.</code>", parse_mode=ParseMode.HTML)
+
+    chat_id = update.effective_chat.id
+    args = context.args
+
+    if args and args[0].lower() in ("on", "off"):
+        await update_chat_settings(chat_id, "flood", {"enabled": args[0].lower() == "on"})
+    elif len(args) == 2:
+        try:
+            messages, window = int(args[0]), float(args[1])
+            if messages < 1 or window <= 0:
+                raise ValueError
+        except ValueError:
+            return await update.message.reply_text("<code>Usage: /flood &lt;messages&gt; &lt;seconds&gt; | on | off</code>", parse_mode=ParseMode.HTML)
+        await update_chat_settings(chat_id, "flood", {"messages": messages, "window": window})
+    elif args:
+        return await update.message.reply_text("<code>Usage: /flood &lt;messages&gt; &lt;seconds&gt; | on | off</code>", parse_mode=ParseMode.HTML)
+
+    limits = await _flood_limits(chat_id)
+    state = "ON" if limits["enabled"] else "OFF"
+    await update.message.reply_text(
+        f"🌊 <b>FLOOD SHIELD: {state}</b>\n\n"
+        f"<b>Limit:</b> {limits['messages']} messages / {limits['window']}s\n"
+        f"<b>Duplicates:</b> {limits['duplicates']} same messages / {limits['dup_window']}s\n"
+        f"<b>Mute:</b> {limits['mute_seconds']}s",
+        parse_mode=ParseMode.HTML,
+    )
+
+
+# ---------- AI ROUTING SETTINGS ----------
+async def routing_cmd(update, context):
+    if not await _is_admin_from_update(update, context):
+        return await update.message.reply_text("<code>Admin only.</code>", parse_mode=ParseMode.HTML)
+
+    chat_id = update.effective_chat.id
+    args = context.args
+    usage = "<code>Usage: /routing &lt;min_confidence 0-1&gt; &lt;escalate_severity 1-5&gt; | reset</code>"
+
+    if args and args[0].lower() == "reset":
+        await update_chat_settings(chat_id, "routing", dict(ROUTING_DEFAULTS))
+    elif len(args) == 2:
+        try:
+            min_confidence, severity = float(args[0]), int(args[1])
+            if not 0 <= min_confidence <= 1 or not 1 <= severity <= 6:
+                raise ValueError
+        except ValueError:
+            return await update.message.reply_text(usage, parse_mode=ParseMode.HTML)
+        await update_chat_settings(chat_id, "routing", {"min_confidence": min_confidence, "escalate_severity": severity})
+    elif args:
+        return await update.message.reply_text(usage, parse_mode=ParseMode.HTML)
+
+    routing = await _routing_settings(chat_id)
+    await update.message.reply_text(
+        f"🧠 <b>AI ROUTING</b>\n\n"
+        f"<b>Escalate if confidence &lt;</b> {routing['min_confidence']}\n"
+        f"<b>Escalate if severity ≥</b> {routing['escalate_severity']}\n"
+        f"<i>Bans hamesha strong model se confirm hote hain.</i>",
+        parse_mode=ParseMode.HTML,
+    )
+
+
+# ---------- CROSS-CHAT BATCHING ----------
+async def batching_cmd(update, context):
+    if not await _is_admin_from_update(update, context):
+        return await update.message.reply_text("<code>Admin only.</code>", parse_mode=ParseMode.HTML)
+
+    chat_id = update.effective_chat.id
+    args = context.args
+
+    if args and args[0].lower() in ("on", "off"):
+        await update_chat_settings(chat_id, "batching", {"shared": args[0].lower() == "on"})
+    elif args:
+        return await update.message.reply_text("<code>Usage: /batching on | off</code>", parse_mode=ParseMode.HTML)
+
+    state = "ON" if await _shared_batching(chat_id) else "OFF"
+    await update.message.reply_text(
+        f"📦 <b>CROSS-CHAT BATCHING: {state}</b>\n\n"
+        f"<i>ON: is chat ke messages doosre opted-in chats ke saath ek AI request me ja sakte hain "
+        f"(kam AI calls). OFF: sirf is chat ke messages ek request me.</i>",
+        parse_mode=ParseMode.HTML,
+    )
+
+
 # ---------- MODERATION (core) ----------
+@instrument(HANDLER_SECONDS, HANDLER_ERRORS, handler="handle_message")
 async def handle_message(update, context):
     message = update.effective_message
     chat = update.effective_chat
@@ -495,13 +794,18 @@ async def handle_message(update, context):
     chat_id = chat.id
     user_id = user.id
 
-    rules = get_rules_db(chat_id)
-    rules_text = "\n".join(rules)
+    rules_text = await get_rules_text(chat_id)
 
-    # Run blocking Gemini moderation in executor so the event loop isn't blocked
+    # pre-filter -> verdict cache -> batched async Gemini
     try:
-        loop = asyncio.get_running_loop()
-        result = await loop.run_in_executor(None, moderate_message, text, {"id": user_id, "username": user.username}, {"id": chat_id, "title": chat.title}, rules_text)
+        result = await moderate_message(
+            text,
+            {"id": user_id, "username": user.username, "first_name": user.first_name},
+            {"id": chat_id, "title": chat.title},
+            rules_text,
+            routing=await _routing_settings(chat_id),
+            shared_batch=await _shared_batching(chat_id),
+        )
     except Exception as e:
         print("moderation call failed:", e)
         result = {"action": "allow", "reason": "ai error", "severity": 1, "should_delete": False}
@@ -521,8 +825,8 @@ async def handle_message(update, context):
     if action == "allow":
         return
 
-    warns = increment_warning(chat_id, user_id)
-    log_action(chat_id, user_id, action, reason)
+    warns = await increment_warning(chat_id, user_id)
+    await log_action(chat_id, user_id, action, reason, category=result.get("category"))
 
     response = f"<b>User:</b> {user.first_name}\n<b>Reason:</b> <code>{reason}</code>\n<b>Warnings:</b> {warns}/{MAX_WARNINGS}"
 
@@ -555,16 +859,12 @@ async def handle_message(update, context):
         """
         asyncio.create_task(send_temp_message(chat, mute_html, seconds=180, style="error"))
 
-        try:
-            await bot.send_message(user.id,
-                f"🔇 <b>You were muted in '{chat.title}'</b>\n\n"
-                f"<b>Duration:</b> {MUTE_DURATION_MIN} minutes\n"
-                f"<b>Reason:</b> <code>{reason}</code>\n\n"
-                f"<i>Agar aapko lagta hai galti se hua, to /appeal &lt;reason&gt; bhejo.</i>",
-                parse_mode=ParseMode.HTML
-            )
-        except Exception:
-            pass
+        dispatcher.detach(_notify_user(bot, user.id,
+            f"🔇 <b>You were muted in '{chat.title}'</b>\n\n"
+            f"<b>Duration:</b> {MUTE_DURATION_MIN} minutes\n"
+            f"<b>Reason:</b> <code>{reason}</code>\n\n"
+            f"<i>Agar aapko lagta hai galti se hua, to /appeal &lt;reason&gt; bhejo.</i>"
+        ))
         return
 
     # BAN (temporary / immediate)
@@ -574,9 +874,7 @@ async def handle_message(update, context):
         except Exception:
             pass
 
-        if user_id not in pending_appeals:
-            pending_appeals[user_id] = set()
-        pending_appeals[user_id].add(chat_id)
+        await pending_appeals.add_to_set(user_id, chat_id)
 
         ban_html = f"""
 ⛔ <b>USER BANNED</b> ⛔
@@ -587,21 +885,34 @@ async def handle_message(update, context):
         """
         asyncio.create_task(send_temp_message(chat, ban_html, seconds=180, style="error"))
 
-        try:
-            await bot.send_message(user.id,
-                f"⛔ <b>You were banned from '{chat.title}'</b>\n\n"
-                f"<b>Reason:</b> <code>{reason}</code>\n\n"
-                f"<i>Agar aapko lagta hai galti se hua, to /appeal &lt;reason&gt; bhejo.</i>",
-                parse_mode=ParseMode.HTML
-            )
-        except Exception:
-            pass
+        dispatcher.detach(_notify_user(bot, user.id,
+            f"⛔ <b>You were banned from '{chat.title}'</b>\n\n"
+            f"<b>Reason:</b> <code>{reason}</code>\n\n"
+            f"<i>Agar aapko lagta hai galti se hua, to /appeal &lt;reason&gt; bhejo.</i>"
+        ))
+
+        await reset_warnings(chat_id, user_id)
+        return
+
+
+# ---------- ADMIN CACHE INVALIDATION ----------
+async def track_admin_changes(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    cmu = update.chat_member or update.my_chat_member
+    if not cmu:
+        return
 
-        reset_warnings(chat_id, user_id)
+    old_status = cmu.old_chat_member.status
+    new_status = cmu.new_chat_member.status
+    if old_status == new_status and new_status not in ADMIN_STATUSES:
         return
 
+    # promote / demote / admin rights change -> roster dobara fetch hoga
+    if old_status in ADMIN_STATUSES or new_status in ADMIN_STATUSES:
+        invalidate_admins(cmu.chat.id)
+
 
 # ---------- GOODBYE ----------
+@instrument(HANDLER_SECONDS, HANDLER_ERRORS, handler="goodbye_member")
 async def goodbye_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message = update.effective_message
     chat = update.effective_chat
@@ -611,8 +922,7 @@ async def goodbye_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not left_member:
         return
 
-    bot_user = await bot.get_me()
-    if left_member.id == bot_user.id:
+    if left_member.id == bot.id:
         await log_to_logger(f"❌ Bot removed from group: {chat.title} (id={chat.id})", bot)
         return
 
@@ -634,9 +944,7 @@ async def coming_soon(update, context):
     await update.message.reply_text(
         "🚧 <b>Coming Soon:</b>\n\n"
         "<blockquote>"
-        "- Advanced analytics dashboard\n"
         "- Custom punishments per rule\n"
-        "- Flood / spam shield\n"
         "- Auto backup & restore"
         "</blockquote>",
         parse_mode=ParseMode.HTML,
@@ -653,23 +961,40 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
 
 
 # ---------- Register handlers on the PTB Application ----------
+def _off_shard(handler):
+    # commands / callbacks ke replies us chat ki per-minute limit pe ruk sakte hain; shard worker
+    # unka wait na kare, warna same shard ke baaki chats ki moderation bhi peeche atak jaati hai
+    async def run(update, context):
+        dispatcher.detach(handler(update, context))
+    return run
+
+
 def register_handlers(app: Application):
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("setrule", setrule))
-    app.add_handler(CommandHandler("rules", show_rules))
-    app.add_handler(CommandHandler("status", status))
-    app.add_handler(CommandHandler("appeal", appeal))
-    app.add_handler(CommandHandler("soon", coming_soon))
+    app.add_handler(CommandHandler("start", _off_shard(start)))
+    app.add_handler(CommandHandler("setrule", _off_shard(setrule)))
+    app.add_handler(CommandHandler("rules", _off_shard(show_rules)))
+    app.add_handler(CommandHandler("status", _off_shard(status)))
+    app.add_handler(CommandHandler("stats", _off_shard(stats_cmd)))
+    app.add_handler(CommandHandler("appeal", _off_shard(appeal)))
+    app.add_handler(CommandHandler("soon", _off_shard(coming_soon)))
+    app.add_handler(CommandHandler("flood", _off_shard(flood_cmd)))
+    app.add_handler(CommandHandler("routing", _off_shard(routing_cmd)))
+    app.add_handler(CommandHandler("batching", _off_shard(batching_cmd)))
+
+    # flood shield sabse pehle (group -1), flood pe ApplicationHandlerStop -> LLM tak nahi jaata
+    app.add_handler(MessageHandler(filters.ChatType.GROUPS & ~filters.StatusUpdate.ALL, flood_guard), group=-1)
 
     # Approval commands
-    app.add_handler(CommandHandler("approve", approve_cmd))
-    app.add_handler(CommandHandler("unapprove", unapprove_cmd))
-    app.add_handler(CommandHandler("unapprove_all", unapprove_all_cmd))
+    app.add_handler(CommandHandler("approve", _off_shard(approve_cmd)))
+    app.add_handler(CommandHandler("unapprove", _off_shard(unapprove_cmd)))
+    app.add_handler(CommandHandler("unapprove_all", _off_shard(unapprove_all_cmd)))
 
     app.add_handler(MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, welcome_new_member))
     app.add_handler(MessageHandler(filters.StatusUpdate.LEFT_CHAT_MEMBER, goodbye_member))
 
-    app.add_handler(CallbackQueryHandler(approve_user, pattern=r"^approve:"))
+    app.add_handler(ChatMemberHandler(track_admin_changes, ChatMemberHandler.ANY_CHAT_MEMBER))
+
+    app.add_handler(CallbackQueryHandler(_off_shard(approve_user), pattern=r"^approve:"))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
     app.add_error_handler(error_handler)
@@ -677,13 +1002,54 @@ def register_handlers(app: Application):
 
 # ---------- Webhook receiver (FastAPI) ----------
 @app.post(WEBHOOK_PATH)
+@instrument(WEBHOOK_SECONDS)
 async def telegram_webhook(req: Request):
-    data = await req.json()
+    if not check_secret(req.headers.get(SECRET_HEADER), WEBHOOK_SECRET):
+        ingress_stats["bad_secret"] += 1
+        return Response(status_code=403)
+
+    try:
+        data = loads(await req.body())
+        update_id = data["update_id"]
+    except Exception:
+        ingress_stats["bad_json"] += 1
+        return Response(status_code=400)
+
+    # slow response pe Telegram same update dobara bhejta hai -> dobara moderate / bill mat karo
+    if update_filter.seen(update_id):
+        ingress_stats["duplicates"] += 1
+        return Response(status_code=200)
+    ingress_stats["received"] += 1
+
+    # worker queue full: group chatter turant drop, baaki thoda wait karke; 200 hi bhejo warna Telegram retry karega
+    if scale_out is not None:
+        if not scale_out.try_route(data):
+            try:
+                sheddable = is_sheddable(Update.de_json(data, application.bot))
+            except Exception:
+                ingress_stats["bad_json"] += 1
+                return Response(status_code=400)
+            if sheddable or not await scale_out.route(data, INGRESS_SUBMIT_TIMEOUT):
+                ingress_stats["shed"] += 1
+                if not sheddable:
+                    logger.warning("Update %s shed, scale-out worker queue full", update_id)
+        return Response(status_code=200)
+
     try:
         update = Update.de_json(data, application.bot)
     except Exception:
+        ingress_stats["bad_json"] += 1
         return Response(status_code=400)
-    await application.update_queue.put(update)
+
+    if not dispatcher.try_submit(update):
+        if is_sheddable(update):
+            ingress_stats["shed"] += 1
+        else:
+            try:
+                await asyncio.wait_for(dispatcher.submit(update), INGRESS_SUBMIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                ingress_stats["shed"] += 1
+                logger.warning("Update %s shed, worker queue full", update_id)
     return Response(status_code=200)
 
 
@@ -692,44 +1058,123 @@ async def root():
     return {"status": "ok"}
 
 
+@app.get("/stats/{chat_id}")
+async def chat_stats(chat_id: int, req: Request, hours: int = 24):
+    # STATS_API_TOKEN set nahi hai to endpoint band
+    if not STATS_API_TOKEN or not check_secret(req.headers.get("X-Stats-Token"), STATS_API_TOKEN):
+        return Response(status_code=404)
+    if not 1 <= hours <= STATS_MAX_HOURS:
+        return Response(status_code=400)
+    return await rollups.summary(chat_id, hours)
+
+
+@app.get("/metrics")
+async def metrics():
+    # scale-out mode me ye sirf isi (ingress) process ke numbers hain
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 # ---------- Startup / Shutdown hooks ----------
-@app.on_event("startup")
-async def startup():
-    validate_config(raise_on_missing=True)
+async def _start_services(owns=None):
     try:
-        ensure_connection()
+        await ensure_connection()
     except Exception as e:
         logger.error("DB connection failed during startup: %s", e)
         raise
 
+    log_sink.start()
+    users_registry.start()
+    groups_registry.start()
+    rollups.start()
+
+    await application.initialize()
+    register_handlers(application)
+    dispatcher.start()
+    await deletion_scheduler.start(application.bot, owns=owns)
+
+
+async def _stop_services():
     try:
-        ensure_indexes()
+        await dispatcher.stop()
+    except Exception as e:
+        logger.error("Update workers shutdown failed: %s", e)
+    await deletion_scheduler.stop()
+    try:
+        await application.shutdown()
+    except Exception:
+        pass
+    try:
+        await moderation_batcher.drain()
+    except Exception:
+        pass
+    try:
+        await log_sink.stop()
+    except Exception as e:
+        logger.error("Log sink drain failed: %s", e)
+    for registry in (users_registry, groups_registry, rollups):
+        try:
+            await registry.stop()
+        except Exception as e:
+            logger.error("Registry flush failed: %s", e)
+    try:
+        close_db()
+    except Exception:
+        pass
+
+
+async def _consume_shard(shard: int, broker):
+    while True:
+        data = await broker.consume(shard)
+        if data is None:
+            return
+        try:
+            update = Update.de_json(data, application.bot)
+        except Exception as e:
+            logger.warning("Dropping undecodable update on shard %d: %s", shard, e)
+            continue
+        await dispatcher.submit(update)
+
+
+async def run_worker(shard: int, broker):
+    # scale-out worker process ka entry point (scaleout._worker_entry se)
+    # har process ka apna limiter hai: Telegram ki global limit workers me baant do (initialize se pehle)
+    application.bot.rate_limiter.global_rate = OUTBOUND_GLOBAL_RATE / SCALE_OUT_WORKERS
+    await _start_services(owns=lambda chat_id: chat_id % SCALE_OUT_WORKERS == shard)
+    logger.info("Webhook worker %d ready", shard)
+    try:
+        await _consume_shard(shard, broker)
+    finally:
+        await _stop_services()
+
+
+@app.on_event("startup")
+async def startup():
+    validate_config(raise_on_missing=True)
+
+    if scale_out is not None and not scale_out.in_process:
+        # ingress process: handlers yaha nahi chalte, sirf routing + webhook setup
+        await ensure_connection()
+        await application.initialize()
+    else:
+        await _start_services()
+
+    try:
+        await ensure_indexes()
     except Exception as e:
         logger.warning("ensure_indexes failed: %s", e)
 
-    await application.initialize()
-    register_handlers(application)
+    # sirf is (ingress / single) process me, scale-out workers archive nahi karte
+    archiver.start()
 
     try:
-        await application.bot.set_webhook(WEBHOOK_URL)
+        # chat_member updates default me nahi aate, admin cache invalidation ke liye chahiye
+        await application.bot.set_webhook(WEBHOOK_URL, allowed_updates=Update.ALL_TYPES, secret_token=WEBHOOK_SECRET)
         logger.info("Webhook set to %s", WEBHOOK_URL)
     except Exception as e:
         logger.error("Failed to set webhook: %s", e)
 
-    async def _process_queue():
-        await asyncio.sleep(0.25)
-        q = getattr(application, "update_queue", None)
-        if q is None:
-            logger.error("No update_queue on application.")
-            return
-        while True:
-            update = await q.get()
-            try:
-                await application.process_update(update)
-            except Exception as ex:
-                logger.exception("Error processing update: %s", ex)
-
-    asyncio.create_task(_process_queue())
+    if scale_out is not None:
+        scale_out.start(local_consumer=_consume_shard)
 
 
 @app.on_event("shutdown")
@@ -738,14 +1183,13 @@ async def shutdown():
         await application.bot.delete_webhook()
     except Exception:
         pass
-    try:
-        await application.shutdown()
-    except Exception:
-        pass
-    try:
-        close_db()
-    except Exception:
-        pass
+    if scale_out is not None:
+        try:
+            await scale_out.stop()
+        except Exception as e:
+            logger.error("Scale-out workers shutdown failed: %s", e)
+    await archiver.stop()
+    await _stop_services()
 
 
 # ---------- For local debugging (not used in production webhook) ----------
@@ -0,0 +1,177 @@
+import asyncio
+import bisect
+import functools
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+
+
+def _label_str(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_str(k)} {v}" for k, v in self._values.items()]
+        return lines
+
+
+class Gauge:
+    # fn diya ho to scrape ke time value li jaati hai (queue depth jaisi cheezein)
+    def __init__(self, name, help_text, fn=None):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self._values = {}
+        _registry.append(self)
+
+    def set(self, value, **labels):
+        self._values[_key(labels)] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if self.fn is not None:
+            try:
+                lines.append(f"{self.name} {self.fn()}")
+            except Exception:
+                pass
+        lines += [f"{self.name}{_label_str(k)} {v}" for k, v in self._values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}  # key -> [bucket counts..., sum, count]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = _key(labels)
+        data = self._values.get(key)
+        if data is None:
+            data = self._values[key] = [0] * (len(self.buckets) + 2)
+        idx = bisect.bisect_left(self.buckets, value)
+        if idx < len(self.buckets):
+            data[idx] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, data in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_str(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_str(key + (('le', '+Inf'),))} {data[-1]}")
+            lines.append(f"{self.name}_sum{_label_str(key)} {data[-2]}")
+            lines.append(f"{self.name}_count{_label_str(key)} {data[-1]}")
+        return lines
+
+
+class StatsCollector:
+    # module ke stats() dict ko as-is expose karta hai: prefix_key value
+    # gauges: wo keys jo current size / depth hain (kind="counter" ho tab bhi gauge type)
+    def __init__(self, prefix, fn, kind="gauge", gauges=()):
+        self.prefix = prefix
+        self.fn = fn
+        self.kind = kind
+        self.gauges = frozenset(gauges)
+        _registry.append(self)
+
+    def render(self):
+        try:
+            stats = self.fn()
+        except Exception:
+            return []
+        lines = []
+        for k, v in stats.items():
+            if isinstance(v, bool) or not isinstance(v, (int, float)):
+                continue
+            name = f"{self.prefix}_{k}"
+            kind = "gauge" if k in self.gauges else self.kind
+            lines += [f"# TYPE {name} {kind}", f"{name} {v}"]
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def instrument(histogram, errors=None, error_label=None, **labels):
+    """Times a sync/async function into `histogram` and counts raised exceptions in `errors`.
+
+    error_label diya ho to errors counter pe exception class ka naam us label me jaata hai.
+    """
+
+    def _count_error(e):
+        if errors is not None:
+            if error_label:
+                errors.inc(**labels, **{error_label: type(e).__name__})
+            else:
+                errors.inc(**labels)
+
+    def deco(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception as e:
+                    _count_error(e)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - start, **labels)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    _count_error(e)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+
+    return deco
+
+
+# ───────────── SHARED METRICS ─────────────
+
+WEBHOOK_SECONDS = Histogram("webhook_request_seconds", "Webhook ingress latency")
+HANDLER_SECONDS = Histogram("handler_seconds", "Telegram update handler latency")
+HANDLER_ERRORS = Counter("handler_errors_total", "Exceptions raised by update handlers")
+GEMINI_SECONDS = Histogram("gemini_request_seconds", "Gemini generate_content latency per attempt")
+GEMINI_TOKENS = Counter("gemini_tokens_total", "Gemini tokens used")
+GEMINI_ERRORS = Counter("gemini_errors_total", "Failed Gemini attempts")
+PROMPT_TOKENS = Histogram("gemini_prompt_tokens_estimated", "Estimated tokens per built moderation prompt",
+                          buckets=(50, 100, 200, 400, 800, 1600, 3200, 6400))
+MONGO_SECONDS = Histogram("mongo_op_seconds", "Mongo operation latency")
+MONGO_ERRORS = Counter("mongo_errors_total", "Failed Mongo operations")
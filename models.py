@@ -1,101 +1,339 @@
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
 from db import db
+from log_sink import log_sink
+from registry import users_registry, groups_registry
+from analytics import rollups
+from state_store import ensure_state_indexes
+from lru import LRUCache
+from config import (
+    RULES_CACHE_SIZE,
+    RULES_CACHE_TTL,
+    WARNING_WINDOW_HOURS,
+    CHAT_SETTINGS_CACHE_SIZE,
+    CHAT_SETTINGS_CACHE_TTL,
+    MODERATION_LOG_RETENTION_DAYS,
+    APPEAL_RETENTION_DAYS,
+    ARCHIVE_DIR,
+    ARCHIVE_GRACE_DAYS,
+    ANALYTICS_RETENTION_DAYS,
+)
+from metrics import instrument, MONGO_SECONDS, MONGO_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# chat_id -> (rules list, compiled rules_text)
+# TTL isliye ki load balancer ke peeche doosre process ke /setrule, /flood changes bhi dikhein
+_rules_cache = LRUCache(RULES_CACHE_SIZE, ttl=RULES_CACHE_TTL)
+# chat_id -> settings dict
+_settings_cache = LRUCache(CHAT_SETTINGS_CACHE_SIZE, ttl=CHAT_SETTINGS_CACHE_TTL)
 
 # ───────────── GROUPS ─────────────
 
-def add_group(chat_id: int, title: str, added_by: int):
-    db.groups.update_one(
-        {"chat_id": chat_id},
-        {
-            "$set": {
-                "chat_id": chat_id,
-                "title": title,
-                "added_by": added_by,
-                "updated_at": datetime.utcnow()
-            },
-            "$setOnInsert": {"created_at": datetime.utcnow()}
-        },
-        upsert=True
-    )
+async def add_group(chat_id: int, title: str, added_by: int):
+    # registry same values pe write skip karta hai, changes batch me bulk_write hote hain
+    await groups_registry.record(chat_id, chat_id, title, added_by)
 
 
 # ───────────── USERS ─────────────
 
-def add_user(user_id: int, username: str):
-    db.users.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {
-                "username": username,
-                "updated_at": datetime.utcnow()
-            },
-            "$setOnInsert": {"created_at": datetime.utcnow()}
-        },
-        upsert=True
-    )
+async def add_user(user_id: int, username: str):
+    await users_registry.record(user_id, username)
 
 
 # ───────────── RULES ─────────────
 
-def add_rule_db(chat_id: int, rule: str):
-    db.rules.insert_one({
+def _cache_rules(chat_id: int, rules: list):
+    return _rules_cache.set(chat_id, (rules, "\n".join(rules)))
+
+
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="fetch_rules")
+async def _fetch_rules(chat_id: int):
+    return [r["rule"] async for r in db.rules.find({"chat_id": chat_id}).sort("_id", 1)]
+
+
+async def _load_rules(chat_id: int):
+    entry = _rules_cache.get(chat_id)
+    if entry is not None:
+        return entry
+    return _cache_rules(chat_id, await _fetch_rules(chat_id))
+
+
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="add_rule_db")
+async def add_rule_db(chat_id: int, rule: str):
+    await db.rules.insert_one({
         "chat_id": chat_id,
         "rule": rule,
         "created_at": datetime.utcnow()
     })
+    # write-through: cached chat ho to wahi list update karo, warna agle read pe load hoga
+    entry = _rules_cache.get(chat_id)
+    if entry is not None:
+        _cache_rules(chat_id, entry[0] + [rule])
+
+
+async def get_rules_db(chat_id: int):
+    rules, _ = await _load_rules(chat_id)
+    return list(rules)
 
 
-def get_rules_db(chat_id: int):
-    return [r["rule"] for r in db.rules.find({"chat_id": chat_id})]
+async def get_rules_text(chat_id: int):
+    _, rules_text = await _load_rules(chat_id)
+    return rules_text
+
+
+def invalidate_rules(chat_id: int = None):
+    if chat_id is None:
+        _rules_cache.clear()
+    else:
+        _rules_cache.pop(chat_id)
+
+
+# ───────────── CHAT SETTINGS ─────────────
+
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="fetch_chat_settings")
+async def _fetch_chat_settings(chat_id: int):
+    return await db.chat_settings.find_one({"chat_id": chat_id}, {"_id": 0, "chat_id": 0, "updated_at": 0})
+
+
+async def get_chat_settings(chat_id: int):
+    settings = _settings_cache.get(chat_id)
+    if settings is not None:
+        return settings
+    return _settings_cache.set(chat_id, await _fetch_chat_settings(chat_id) or {})
+
+
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="update_chat_settings")
+async def update_chat_settings(chat_id: int, section: str, values: dict):
+    # e.g. section="flood", values={"messages": 6} -> flood.messages set hota hai
+    await db.chat_settings.update_one(
+        {"chat_id": chat_id},
+        {
+            "$set": {
+                **{f"{section}.{k}": v for k, v in values.items()},
+                "updated_at": datetime.utcnow()
+            }
+        },
+        upsert=True
+    )
+    _settings_cache.pop(chat_id)
+    return await get_chat_settings(chat_id)
 
 
 # ───────────── WARNINGS ─────────────
 
-def increment_warning(chat_id: int, user_id: int):
-    data = db.warnings.find_one({"chat_id": chat_id, "user_id": user_id})
-    if data:
-        new = data["warnings"] + 1
-        db.warnings.update_one(
-            {"chat_id": chat_id, "user_id": user_id},
-            {"$set": {"warnings": new}}
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="increment_warning")
+async def increment_warning(chat_id: int, user_id: int):
+    # single round trip: upsert + $inc, naya count wapas milta hai
+    query = {"chat_id": chat_id, "user_id": user_id}
+    update = {"$inc": {"warnings": 1}, "$set": {"updated_at": datetime.utcnow()}}
+    try:
+        doc = await db.warnings.find_one_and_update(
+            query, update, upsert=True, return_document=ReturnDocument.AFTER
         )
-        return new
-    else:
-        db.warnings.insert_one({
-            "chat_id": chat_id,
-            "user_id": user_id,
-            "warnings": 1
-        })
-        return 1
+    except DuplicateKeyError:
+        # do parallel upserts me se ek insert jeet gaya, dusra ab existing doc pe $inc karega
+        doc = await db.warnings.find_one_and_update(
+            query, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    return doc["warnings"]
 
 
-def reset_warnings(chat_id: int, user_id: int):
-    db.warnings.delete_one({"chat_id": chat_id, "user_id": user_id})
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="reset_warnings")
+async def reset_warnings(chat_id: int, user_id: int):
+    await db.warnings.delete_one({"chat_id": chat_id, "user_id": user_id})
 
 
-def get_all_warnings(chat_id: int):
-    return list(db.warnings.find({"chat_id": chat_id}))
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="get_all_warnings")
+async def get_all_warnings(chat_id: int):
+    return await db.warnings.find({"chat_id": chat_id}).to_list(length=None)
 
 
 # ───────────── APPEALS ─────────────
 
-def log_appeal(user_id: int, chat_id: int, appeal_text: str, approved: bool):
-    db.appeals.insert_one({
+async def log_appeal(user_id: int, chat_id: int, appeal_text: str, approved: bool):
+    now = datetime.utcnow()
+    await log_sink.submit("appeals", {
         "user_id": user_id,
         "chat_id": chat_id,
         "appeal_text": appeal_text,
         "approved": approved,
-        "created_at": datetime.utcnow()
+        "created_at": now
     })
+    await rollups.record(chat_id, "appeal", "approved" if approved else "rejected", ts=now)
 
 
 # ───────────── MODERATION LOGS ─────────────
 
-def log_action(chat_id: int, user_id: int, action: str, reason: str):
-    db.moderation_logs.insert_one({
+async def log_action(chat_id: int, user_id: int, action: str, reason: str, category: str = None):
+    now = datetime.utcnow()
+    await log_sink.submit("moderation_logs", {
         "chat_id": chat_id,
         "user_id": user_id,
         "action": action,
         "reason": reason,
-        "created_at": datetime.utcnow()
+        "category": category,
+        "created_at": now
     })
+    # /stats raw logs scan nahi karta, ye hourly counters padhta hai
+    await rollups.record(chat_id, action, category, ts=now)
+
+
+# ───────────── RETENTION ─────────────
+
+# collection -> kitne din rakhna hai (0 = forever)
+RETENTION_DAYS = {
+    "moderation_logs": MODERATION_LOG_RETENTION_DAYS,
+    "appeals": APPEAL_RETENTION_DAYS,
+}
+
+
+def retention_ttl_seconds(collection: str) -> int:
+    days = RETENTION_DAYS[collection]
+    if days <= 0:
+        return 0
+    # archiver on ho to TTL sirf safety net hai, pehle archiver ko chance milta hai
+    if ARCHIVE_DIR:
+        days += ARCHIVE_GRACE_DAYS
+    return days * 86400
+
+
+async def iter_expired(collection: str, cutoff: datetime, limit: int):
+    # _id tie-breaker: same expired docs dobara padhe to same chunk aur same segment naam bane
+    cursor = db[collection].find({"created_at": {"$lt": cutoff}}).sort([("created_at", 1), ("_id", 1)]).limit(limit)
+    async for doc in cursor:
+        yield doc
+
+
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="delete_archived")
+async def delete_archived(collection: str, ids: list, chunk: int = 1000):
+    deleted = 0
+    for i in range(0, len(ids), chunk):
+        res = await db[collection].delete_many({"_id": {"$in": ids[i:i + chunk]}})
+        deleted += res.deleted_count
+    return deleted
+
+
+# ───────────── VERDICT CACHE ─────────────
+
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="get_cached_verdict")
+async def get_cached_verdict(key: str):
+    doc = await db.verdict_cache.find_one({"_id": key})
+    if not doc or doc["expires_at"] <= datetime.utcnow():
+        return None
+    return doc["verdict"]
+
+
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="save_cached_verdict")
+async def save_cached_verdict(key: str, verdict: dict, ttl: int):
+    await db.verdict_cache.update_one(
+        {"_id": key},
+        {"$set": {"verdict": verdict, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)}},
+        upsert=True
+    )
+
+
+# ───────────── SCHEDULED DELETIONS ─────────────
+
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="add_scheduled_deletion")
+async def add_scheduled_deletion(chat_id: int, message_id: int, due_ts: float):
+    # seedha likho, log_sink nahi: wo backpressure me drop karta hai aur flush late hota hai
+    await db.scheduled_deletions.update_one(
+        {"_id": f"{chat_id}:{message_id}"},
+        {"$set": {"chat_id": chat_id, "message_id": message_id, "due_at": datetime.utcfromtimestamp(due_ts)}},
+        upsert=True
+    )
+
+
+@instrument(MONGO_SECONDS, MONGO_ERRORS, op="remove_scheduled_deletions")
+async def remove_scheduled_deletions(entries: list):
+    if entries:
+        await db.scheduled_deletions.delete_many(
+            {"_id": {"$in": [f"{chat_id}:{message_id}" for chat_id, message_id in entries]}}
+        )
+
+
+async def load_scheduled_deletions():
+    async for doc in db.scheduled_deletions.find({}, {"chat_id": 1, "message_id": 1, "due_at": 1}):
+        due_ts = (doc["due_at"] - datetime(1970, 1, 1)).total_seconds()
+        yield doc["chat_id"], doc["message_id"], due_ts
+
+
+# ───────────── INDEXES ─────────────
+
+async def _ensure_ttl_index(coll, field: str, seconds: int):
+    name = f"{field}_ttl"
+    existing = await coll.index_information()
+
+    if seconds <= 0:
+        if name in existing:
+            await coll.drop_index(name)
+        return
+
+    if name in existing:
+        if existing[name].get("expireAfterSeconds") != seconds:
+            await coll.database.command(
+                "collMod", coll.name, index={"name": name, "expireAfterSeconds": seconds}
+            )
+        return
+
+    await coll.create_index([(field, ASCENDING)], name=name, expireAfterSeconds=seconds)
+
+
+async def _merge_duplicate_warnings():
+    # purane find_one/insert_one race se bane duplicate docs ko ek me merge karo
+    pipeline = [
+        {"$group": {
+            "_id": {"chat_id": "$chat_id", "user_id": "$user_id"},
+            "ids": {"$push": "$_id"},
+            "total": {"$sum": "$warnings"},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    async for dup in db.warnings.aggregate(pipeline):
+        keep, *extra = dup["ids"]
+        await db.warnings.update_one(
+            {"_id": keep},
+            {"$set": {"warnings": dup["total"], "updated_at": datetime.utcnow()}},
+        )
+        await db.warnings.delete_many({"_id": {"$in": extra}})
+
+
+async def ensure_indexes():
+    warning_key = [("chat_id", ASCENDING), ("user_id", ASCENDING)]
+    try:
+        await db.warnings.create_index(warning_key, unique=True, name="chat_user_unique")
+    except OperationFailure as e:
+        if e.code != 11000:
+            raise
+        logger.warning("Duplicate warning docs found, merging before creating unique index")
+        await _merge_duplicate_warnings()
+        await db.warnings.create_index(warning_key, unique=True, name="chat_user_unique")
+
+    # WARNING_WINDOW_HOURS > 0 ho to last warning ke itne ghante baad counter reset (TTL monitor ~60s granularity)
+    await _ensure_ttl_index(db.warnings, "updated_at", WARNING_WINDOW_HOURS * 3600)
+
+    await db.rules.create_index([("chat_id", ASCENDING)], name="chat_id")
+    await db.chat_settings.create_index([("chat_id", ASCENDING)], unique=True, name="chat_id_unique")
+
+    await db.verdict_cache.create_index(
+        [("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0
+    )
+
+    # per-chat queries (/status, analytics) + retention horizon wale TTL indexes
+    for collection in RETENTION_DAYS:
+        await db[collection].create_index(
+            [("chat_id", ASCENDING), ("created_at", ASCENDING)], name="chat_created"
+        )
+        await _ensure_ttl_index(db[collection], "created_at", retention_ttl_seconds(collection))
+
+    await db.analytics_hourly.create_index([("chat_id", ASCENDING), ("hour", ASCENDING)], name="chat_hour")
+    await _ensure_ttl_index(db.analytics_hourly, "hour", ANALYTICS_RETENTION_DAYS * 86400)
+
+    # Telegram 48h se purane messages bot delete nahi kar sakta, utne baad entry bekaar hai
+    await _ensure_ttl_index(db.scheduled_deletions, "due_at", 48 * 3600)
+
+    await ensure_state_indexes()
@@ -1,11 +1,30 @@
 import json
+import random
+import asyncio
+import logging
 import google.generativeai as genai
-from config import GEMINI_API_KEY
+from google.api_core.exceptions import ServerError, TooManyRequests
+from config import (
+    GEMINI_API_KEY,
+    GEMINI_MAX_INFLIGHT,
+    GEMINI_MAX_INFLIGHT_PER_CHAT,
+    GEMINI_TIMEOUT,
+    GEMINI_MAX_RETRIES,
+    GEMINI_BACKOFF_BASE,
+    GEMINI_BACKOFF_MAX,
+    GEMINI_FAST_MODEL,
+    GEMINI_STRONG_MODEL,
+    ROUTING_ENABLED,
+    ROUTING_MIN_CONFIDENCE,
+    ROUTING_ESCALATE_SEVERITY,
+)
+import prefilter
+from prompt_builder import build_message_prompt, build_batch_prompt, build_appeal_prompt
+from verdict_cache import verdict_cache, cache_key
+from batcher import ModerationBatcher
+from metrics import instrument, GEMINI_SECONDS, GEMINI_TOKENS, GEMINI_ERRORS
 
-# Gemini Init
-genai.configure(api_key=GEMINI_API_KEY)
-moderation_model = genai.GenerativeModel("gemini-2.5-flash")
-appeal_model = genai.GenerativeModel("gemini-2.5-flash")
+logger = logging.getLogger(__name__)
 
 
 MODERATION_SYS = """
@@ -13,7 +32,9 @@ You are an AI moderator for a Telegram group chat.
 
 Follow:
 1. Universal safety rules
-2. Custom group rules provided
+2. Custom group rules given under RULES
+
+Judge the text under MESSAGE.
 
 Actions:
 - allow
@@ -28,10 +49,78 @@ Return ONLY a JSON:
  "reason": "...",
  "category": "...",
  "severity": 1-5,
- "should_delete": true/false
+ "should_delete": true/false,
+ "confidence": 0.0-1.0
 }
 """
 
+MODERATION_BATCH_SYS = """
+You are an AI moderator for a Telegram group chat.
+
+Follow:
+1. Universal safety rules
+2. Custom group rules given under RULES
+
+You get several messages, each with an "id" and the "chat" it was sent in.
+Judge every message on its own.
+
+Actions:
+- allow
+- warn
+- mute
+- ban
+- delete
+
+Return ONLY a JSON:
+{
+ "verdicts": [
+  {
+   "id": "...",
+   "action": "...",
+   "reason": "...",
+   "category": "...",
+   "severity": 1-5,
+   "should_delete": true/false,
+   "confidence": 0.0-1.0
+  }
+ ]
+}
+"""
+
+
+APPEAL_SYS = """
+You review Telegram ban appeals.
+
+Approve if:
+- user is genuinely sorry
+- promises to follow rules
+
+Reject if:
+- still abusive
+- fake apology
+- trolling
+
+Return only JSON:
+{
+ "approve": true/false,
+ "reason": "..."
+}
+"""
+
+# Gemini Init - static instructions ek baar system_instruction me, har call me sirf rules + message
+genai.configure(api_key=GEMINI_API_KEY)
+# first pass sasta model (routing off ho to seedha strong), doubtful cases escalation_model pe
+_FIRST_PASS_MODEL = GEMINI_FAST_MODEL if ROUTING_ENABLED else GEMINI_STRONG_MODEL
+moderation_model = genai.GenerativeModel(_FIRST_PASS_MODEL, system_instruction=MODERATION_SYS)
+moderation_batch_model = genai.GenerativeModel(_FIRST_PASS_MODEL, system_instruction=MODERATION_BATCH_SYS)
+escalation_model = genai.GenerativeModel(GEMINI_STRONG_MODEL, system_instruction=MODERATION_SYS)
+appeal_model = genai.GenerativeModel(GEMINI_STRONG_MODEL, system_instruction=APPEAL_SYS)
+
+ROUTING_DEFAULTS = {
+    "min_confidence": ROUTING_MIN_CONFIDENCE,
+    "escalate_severity": ROUTING_ESCALATE_SEVERITY,
+}
+
 
 def safe_json(text, default):
     try:
@@ -41,82 +130,271 @@ def safe_json(text, default):
         return default
 
 
-def moderate_message(text, user, chat, rules_text: str):
-    username = f"@{user.username}" if user.username else user.first_name
-    chat_title = chat.title or str(chat.id)
+def _field(obj, name):
+    # handle_message dicts bhejta hai, baaki callers telegram objects
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
 
-    prompt = f"""
-{MODERATION_SYS}
 
-GROUP RULES:
-{rules_text}
+# ───────────── ASYNC GEMINI CLIENT ─────────────
 
-CHAT:
-{chat_title}
+# 429 / 5xx / timeout pe retry, baaki errors (bad request, auth) turant fail
+RETRYABLE_ERRORS = (TooManyRequests, ServerError, asyncio.TimeoutError)
 
-USER:
-{username} (ID: {user.id})
+_global_slots = asyncio.Semaphore(GEMINI_MAX_INFLIGHT)
+_chat_slots = {}  # chat_id -> [Semaphore, users]
+_llm_stats = {"in_flight": 0, "calls": 0, "retries": 0, "errors": 0}
 
-MESSAGE:
-{text}
-"""
+
+class _ChatSlot:
+    # per-chat cap: ek busy chat saare global slots nahi le sakta
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+
+    async def __aenter__(self):
+        if self.chat_id is None:
+            return
+        entry = _chat_slots.get(self.chat_id)
+        if entry is None:
+            entry = _chat_slots[self.chat_id] = [asyncio.Semaphore(GEMINI_MAX_INFLIGHT_PER_CHAT), 0]
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._release_user(entry)
+            raise
+
+    async def __aexit__(self, *exc):
+        if self.chat_id is None:
+            return
+        entry = _chat_slots[self.chat_id]
+        entry[0].release()
+        self._release_user(entry)
+
+    def _release_user(self, entry):
+        entry[1] -= 1
+        if entry[1] == 0:
+            _chat_slots.pop(self.chat_id, None)
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter: 0 .. min(max, base * 2^attempt)
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _record_usage(res, model_name):
+    usage = getattr(res, "usage_metadata", None)
+    if usage is None:
+        return
+    GEMINI_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, model=model_name, type="prompt")
+    GEMINI_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, model=model_name, type="output")
+
+
+_attempts = {}  # model_name -> instrumented single attempt
+
+
+def _attempt_for(model_name):
+    # model label har model ke liye alag, isliye instrumented attempt model-wise banta hai
+    attempt = _attempts.get(model_name)
+    if attempt is None:
+        @instrument(GEMINI_SECONDS, GEMINI_ERRORS, error_label="error", model=model_name)
+        async def attempt(model, prompt, kwargs):
+            return await asyncio.wait_for(model.generate_content_async(prompt, **kwargs), GEMINI_TIMEOUT)
+
+        attempt = _attempts[model_name] = attempt
+    return attempt
+
+
+async def generate_content_async(model, prompt, chat_id=None, **kwargs):
+    model_name = getattr(model, "model_name", "unknown")
+    call = _attempt_for(model_name)
+    async with _ChatSlot(chat_id):
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            try:
+                async with _global_slots:
+                    _llm_stats["in_flight"] += 1
+                    _llm_stats["calls"] += 1
+                    try:
+                        res = await call(model, prompt, kwargs)
+                    finally:
+                        _llm_stats["in_flight"] -= 1
+                    _record_usage(res, model_name)
+                    return res
+            except RETRYABLE_ERRORS as e:
+                if attempt >= GEMINI_MAX_RETRIES:
+                    _llm_stats["errors"] += 1
+                    raise
+                _llm_stats["retries"] += 1
+                delay = _backoff(attempt)
+                logger.info("Gemini call failed (%s), retry %d in %.2fs", type(e).__name__, attempt + 1, delay)
+                # backoff ke time global slot free rehta hai
+                await asyncio.sleep(delay)
+
+
+def llm_stats():
+    return {**_llm_stats, "limit": GEMINI_MAX_INFLIGHT, "active_chats": len(_chat_slots)}
+
+
+# ───────────── MODERATION ─────────────
+
+_FIRST_TIER = "fast" if ROUTING_ENABLED else "strong"
+_tier_stats = {"prefilter": 0, "fast": 0, "strong": 0, "escalated": 0, "escalation_failed": 0}
+
+
+async def _moderate_llm(text, user, chat, rules_text: str, model=None, tier=_FIRST_TIER):
+    user_id = _field(user, "id")
+    username = f"@{_field(user, 'username')}" if _field(user, "username") else _field(user, "first_name")
+    chat_title = _field(chat, "title") or str(_field(chat, "id"))
+
+    prompt = build_message_prompt(text, f"{username} (ID: {user_id})", chat_title, rules_text)
 
     default = {
         "action": "allow",
         "reason": "AI error",
         "category": "other",
         "severity": 1,
-        "should_delete": False
+        "should_delete": False,
+        "source": "error",
     }
 
     try:
-        res = moderation_model.generate_content(
+        res = await generate_content_async(
+            model or moderation_model,
             prompt,
+            chat_id=_field(chat, "id"),
             generation_config={"response_mime_type": "application/json"},
         )
         data = safe_json(res.text.strip(), default)
+        if data is not default:
+            data["source"] = "gemini"
+            data["tier"] = tier
         return data
-    except:
+    except Exception as e:
+        logger.warning("Gemini moderation failed: %s", e)
         return default
 
 
-# ───────────── APPEAL ─────────────
+async def _moderate_llm_batch(items):
+    # items: [(item_id, (text, user, chat, rules_text))], rules sab ke same; chats alag sirf
+    # tab jab sab chats ne /batching on kiya ho
+    rules_text = items[0][1][3]
+    chat_ids = {_field(chat, "id") for _, (_, _, chat, _) in items}
 
-APPEAL_SYS = """
-You review Telegram ban appeals.
+    messages = []
+    for item_id, (text, user, chat, _) in items:
+        username = f"@{_field(user, 'username')}" if _field(user, "username") else _field(user, "first_name")
+        messages.append({
+            "id": item_id,
+            "chat": _field(chat, "title") or str(_field(chat, "id")),
+            "user": f"{username} (ID: {_field(user, 'id')})",
+            "message": text,
+        })
 
-Approve if:
-- user is genuinely sorry
-- promises to follow rules
+    prompt = build_batch_prompt(messages, rules_text)
 
-Reject if:
-- still abusive
-- fake apology
-- trolling
+    # multi-chat request sirf global limiter se, ek chat ka batch us chat ke slot se
+    res = await generate_content_async(
+        moderation_batch_model,
+        prompt,
+        chat_id=next(iter(chat_ids)) if len(chat_ids) == 1 else None,
+        generation_config={"response_mime_type": "application/json"},
+    )
+    data = safe_json(res.text.strip(), {})
+    verdicts = {}
+    for v in data.get("verdicts") or []:
+        if isinstance(v, dict) and "id" in v and "action" in v:
+            item_id = str(v.pop("id"))
+            v["source"] = "gemini"
+            v["tier"] = _FIRST_TIER
+            verdicts[item_id] = v
+    return verdicts
 
-Return only JSON:
-{
- "approve": true/false,
- "reason": "..."
-}
-"""
 
+async def _run_single(payload):
+    return await _moderate_llm(*payload)
 
-def evaluate_appeal(text: str):
-    prompt = f"""
-{APPEAL_SYS}
 
-USER APPEAL:
-{text}
-"""
+moderation_batcher = ModerationBatcher(_moderate_llm_batch, _run_single)
+
+
+def needs_escalation(verdict, routing=None) -> bool:
+    # fast model ka verdict doubtful (kam confidence / AI error) ya bhaari (ban, high severity) ho to strong model
+    if not ROUTING_ENABLED:
+        return False
+    if verdict.get("source") == "error":
+        return True
+    if verdict.get("tier") != "fast":
+        return False
+    if verdict.get("action") == "ban":
+        return True
+    routing = routing or ROUTING_DEFAULTS
+    try:
+        confidence = float(verdict.get("confidence", 0))
+        severity = int(verdict.get("severity", 1))
+    except (TypeError, ValueError):
+        return True
+    return confidence < routing["min_confidence"] or severity >= routing["escalate_severity"]
+
+
+async def moderate_message(text, user, chat, rules_text: str, routing=None, shared_batch=False):
+    # sasta local stage: trivial allow / blocklist delete, Gemini call hi nahi hoga
+    verdict = prefilter.classify(text, rules_text)
+    if verdict is not None:
+        _tier_stats["prefilter"] += 1
+        return verdict
+
+    chat_id = _field(chat, "id")
+
+    async def _call():
+        # ek prompt me alag chats ke messages = ek tenant ka text doosre ke verdict pe asar daal sakta hai,
+        # isliye cross-chat batch sirf opt-in chats ka; baaki ka batch sirf apne chat ka (backfill me kaam aata hai)
+        if shared_batch:
+            return await moderation_batcher.submit(("shared", rules_text), (text, user, chat, rules_text), shard=chat_id)
+        return await moderation_batcher.submit(
+            (chat_id, rules_text), (text, user, chat, rules_text), shard=chat_id, cross_shard=False,
+        )
+
+    async def _escalate():
+        return await _moderate_llm(text, user, chat, rules_text, model=escalation_model, tier="strong")
+
+    # same text + same rules -> cached / in-flight verdict reuse
+    key = cache_key(text, rules_text)
+    verdict = await verdict_cache.get_or_compute(key, _call)
+
+    if needs_escalation(verdict, routing):
+        # strong verdict alag key pe cache, taaki alag thresholds wale chats fast verdict reuse kar sakein
+        _tier_stats["escalated"] += 1
+        strong = await verdict_cache.get_or_compute(f"{key}:strong", _escalate)
+        if strong.get("source") != "error":
+            verdict = strong
+        else:
+            _tier_stats["escalation_failed"] += 1
+
+    tier = verdict.get("tier")
+    if tier in _tier_stats:
+        _tier_stats[tier] += 1
+    return verdict
+
+
+def tier_stats():
+    return dict(_tier_stats)
+
+
+# ───────────── APPEAL ─────────────
+
+async def evaluate_appeal(text: str):
+    prompt = build_appeal_prompt(text)
 
     default = {"approve": False, "reason": "AI error"}
 
     try:
-        res = appeal_model.generate_content(
+        res = await generate_content_async(
+            appeal_model,
             prompt,
             generation_config={"response_mime_type": "application/json"},
         )
         return safe_json(res.text.strip(), default)
-    except:
+    except Exception as e:
+        logger.warning("Gemini appeal review failed: %s", e)
         return default
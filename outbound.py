@@ -0,0 +1,236 @@
+import asyncio
+import heapq
+import itertools
+import logging
+
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import BaseRateLimiter
+
+from config import (
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_GROUP_PER_MIN,
+    OUTBOUND_PRIVATE_RATE,
+    OUTBOUND_MAX_RETRIES,
+    OUTBOUND_MAX_CHATS,
+)
+from lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Chhota number = pehle jaata hai
+PRIORITY_CRITICAL = 0  # ban / restrict
+PRIORITY_HIGH = 1      # deletes, callback answers
+PRIORITY_NORMAL = 2    # command replies
+PRIORITY_LOW = 3       # temp notices, welcome / goodbye
+
+ENDPOINT_PRIORITY = {
+    "banChatMember": PRIORITY_CRITICAL,
+    "restrictChatMember": PRIORITY_CRITICAL,
+    "unbanChatMember": PRIORITY_HIGH,
+    "deleteMessage": PRIORITY_HIGH,
+    "deleteMessages": PRIORITY_HIGH,
+    "answerCallbackQuery": PRIORITY_HIGH,
+}
+
+# Sirf ye endpoints per-chat message limit me count hote hain (Telegram ka ~20 msg/min per group)
+MESSAGE_ENDPOINTS = frozenset({
+    "sendMessage", "sendPhoto", "sendAnimation", "sendVideo", "sendDocument", "sendSticker",
+    "copyMessage", "forwardMessage", "editMessageText", "editMessageReplyMarkup",
+})
+
+# Same chat/user/message pe same action parallel aaye to ek hi request jaati hai
+COALESCE_ENDPOINTS = frozenset({
+    "banChatMember", "restrictChatMember", "unbanChatMember", "deleteMessage", "deleteMessages",
+})
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now) -> float:
+        if self.paused_until > now:
+            return self.paused_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, until):
+        self.paused_until = max(self.paused_until, until)
+
+
+def _retry_seconds(err: RetryAfter) -> float:
+    value = err.retry_after
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+def _chat_key(data):
+    chat_id = data.get("chat_id")
+    if chat_id is None:
+        return None
+    try:
+        return int(chat_id)
+    except (TypeError, ValueError):
+        return chat_id  # "@channelusername"
+
+
+class OutboundRateLimiter(BaseRateLimiter):
+    """Central outbound scheduler for every Bot API call.
+
+    Global + per-chat token buckets, priority ordering (bans before notices),
+    RetryAfter-aware retries and coalescing of identical in-flight moderation actions.
+    Pass rate_limit_args={"priority": PRIORITY_LOW} on a bot call to override its class.
+    """
+
+    def __init__(self, global_rate=OUTBOUND_GLOBAL_RATE, group_per_min=OUTBOUND_GROUP_PER_MIN,
+                 private_rate=OUTBOUND_PRIVATE_RATE, max_retries=OUTBOUND_MAX_RETRIES):
+        self.global_rate = global_rate
+        self.group_rate = group_per_min / 60
+        self.group_capacity = max(1, group_per_min)
+        self.private_rate = private_rate
+        self.max_retries = max_retries
+        self._global = None
+        self._chats = LRUCache(OUTBOUND_MAX_CHATS)
+        self._waiting = []  # heap of (priority, seq, chat_key, future)
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._pump_task = None
+        self._inflight = {}
+        self.stats = {"requests": 0, "coalesced": 0, "retry_after": 0, "errors": 0}
+
+    async def initialize(self):
+        # Application aur ExtBot dono initialize call karte hain; pump jis Event pe wait kar raha hai use replace mat karo
+        if self._pump_task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        # rate < 1 (e.g. workers me baanta hua) pe bhi bucket me kam se kam ek token aa sake
+        self._global = TokenBucket(self.global_rate, max(1, self.global_rate), loop.time())
+        self._wakeup = asyncio.Event()
+        self._pump_task = asyncio.create_task(self._pump())
+
+    async def shutdown(self):
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            await asyncio.gather(self._pump_task, return_exceptions=True)
+            self._pump_task = None
+
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    def _new_bucket(self, chat_key, now):
+        # private chats (positive id) me 1 msg/s, groups/channels me per-minute limit
+        if isinstance(chat_key, int) and chat_key > 0:
+            return TokenBucket(self.private_rate, max(1, self.private_rate), now)
+        return TokenBucket(self.group_rate, self.group_capacity, now)
+
+    def _chat_bucket(self, chat_key, now):
+        return self._chats.get_or_create(chat_key, lambda: self._new_bucket(chat_key, now))
+
+    # ───────────── scheduling ─────────────
+
+    async def _acquire(self, priority, chat_key):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._seq), chat_key, fut))
+        self._wakeup.set()
+        await fut
+
+    async def _pump(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            next_wake = None
+            blocked = []
+
+            while self._waiting:
+                global_wait = self._global.wait_time(now)
+                if global_wait > 0:
+                    next_wake = global_wait if next_wake is None else min(next_wake, global_wait)
+                    break
+                item = heapq.heappop(self._waiting)
+                _, _, chat_key, fut = item
+                if fut.done():  # caller cancel ho gaya
+                    continue
+                if chat_key is not None:
+                    bucket = self._chat_bucket(chat_key, now)
+                    wait = bucket.wait_time(now)
+                    if wait > 0:
+                        # ye chat abhi limit pe hai, doosre chats ko aage jaane do
+                        blocked.append(item)
+                        next_wake = wait if next_wake is None else min(next_wake, wait)
+                        continue
+                    bucket.take(now)
+                self._global.take(now)
+                fut.set_result(None)
+
+            for item in blocked:
+                heapq.heappush(self._waiting, item)
+
+            self._wakeup.clear()
+            try:
+                if next_wake is None:
+                    await self._wakeup.wait()
+                else:
+                    await asyncio.wait_for(self._wakeup.wait(), next_wake)
+            except asyncio.TimeoutError:
+                pass
+
+    # ───────────── BaseRateLimiter hook ─────────────
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        self.stats["requests"] += 1
+        if endpoint not in COALESCE_ENDPOINTS:
+            return await self._send(callback, args, kwargs, endpoint, data, rate_limit_args)
+
+        # until_date har baar thoda alag hota hai, usse key me mat lo
+        key = (endpoint, tuple(sorted((k, str(v)) for k, v in data.items() if k != "until_date")))
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(fut)
+
+        fut = asyncio.ensure_future(self._send(callback, args, kwargs, endpoint, data, rate_limit_args))
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(fut)
+
+    async def _send(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = (rate_limit_args or {}).get("priority", ENDPOINT_PRIORITY.get(endpoint, PRIORITY_NORMAL))
+        chat_key = _chat_key(data) if endpoint in MESSAGE_ENDPOINTS else None
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority, chat_key)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.stats["retry_after"] += 1
+                delay = _retry_seconds(e)
+                if attempt >= self.max_retries:
+                    self.stats["errors"] += 1
+                    logger.warning("%s gave up after %d RetryAfter (chat=%s)", endpoint, attempt + 1, data.get("chat_id"))
+                    raise
+                # flood wait: us chat ka (ya global) bucket pause, baaki requests bhi ruk jaayengi
+                until = loop.time() + delay
+                if chat_key is not None:
+                    self._chat_bucket(chat_key, loop.time()).pause(until)
+                else:
+                    self._global.pause(until)
+                logger.info("RetryAfter %.1fs on %s (chat=%s)", delay, endpoint, data.get("chat_id"))
+                await asyncio.sleep(delay)
+            except TelegramError as e:
+                self.stats["errors"] += 1
+                logger.warning("Telegram API %s failed (chat=%s): %s", endpoint, data.get("chat_id"), e)
+                raise
@@ -0,0 +1,151 @@
+import logging
+import re
+import unicodedata
+
+from lru import LRUCache, MISSING
+
+from config import PREFILTER_ENABLED, GLOBAL_BLOCKLIST, GLOBAL_BLOCK_REGEX, PREFILTER_TRIVIAL_MAX_LEN
+
+logger = logging.getLogger(__name__)
+
+# Bina LLM ke clear "allow" hone wale chhote messages
+TRIVIAL_WORDS = frozenset({
+    "ok", "okay", "okk", "k", "kk", "gm", "gn", "ge", "ga", "hi", "hii", "hello", "hey", "yo",
+    "thanks", "thank", "you", "thx", "ty", "tysm", "welcome", "lol", "lmao", "haha", "hehe",
+    "yes", "yeah", "yup", "no", "nope", "hmm", "hm", "bye", "good", "morning", "night",
+    "nice", "cool", "great", "done", "sure", "accha", "acha", "haan", "ha", "nahi", "theek",
+    "thik", "hai", "bhai", "bro", "sir", "ji", "+1", "gg", "wow", "omg",
+})
+
+_WORD_RE = re.compile(r"[\w+]+", re.UNICODE)
+_MATCHER_CACHE_SIZE = 1024
+
+# rules_text -> compiled matcher (ya None)
+_matchers = LRUCache(_MATCHER_CACHE_SIZE)
+_stages = []
+_stats = {"checked": 0, "allowed": 0, "deleted": 0, "passed": 0}
+
+
+def _verdict(action, reason, category, severity, should_delete):
+    return {
+        "action": action,
+        "reason": reason,
+        "category": category,
+        "severity": severity,
+        "should_delete": should_delete,
+        "source": "prefilter",
+    }
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold().strip()
+
+
+def _global_patterns():
+    if not GLOBAL_BLOCK_REGEX:
+        return []
+    try:
+        re.compile(GLOBAL_BLOCK_REGEX)
+    except re.error as e:
+        logger.error("GLOBAL_BLOCK_REGEX invalid, ignored: %s", e)
+        return []
+    return [GLOBAL_BLOCK_REGEX]
+
+
+_GLOBAL_PATTERNS = _global_patterns()
+
+
+def rule_kind(line: str):
+    head, sep, body = line.partition(":")
+    head = head.strip().lower()
+    if sep and body.strip() and head in ("block", "regex"):
+        return head
+    return None
+
+
+def _rule_terms(rules_text: str):
+    # /setrule "block: casino, bet365" -> keywords. "regex:" lines chat rules se nahi lete:
+    # admin ka backtracking pattern har message pe event loop rok deta, regex sirf GLOBAL_BLOCK_REGEX se
+    terms = set(GLOBAL_BLOCKLIST)
+    for line in rules_text.splitlines():
+        if rule_kind(line) == "block":
+            body = line.partition(":")[2]
+            terms.update(normalize(t) for t in body.split(",") if t.strip())
+    return terms
+
+
+def _compile_matcher(rules_text: str):
+    terms = _rule_terms(rules_text)
+    parts = []
+    if terms:
+        # lambe terms pehle, taaki alternation me chhota prefix jeet na jaye
+        alt = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+        parts.append(rf"(?<!\w)(?:{alt})(?!\w)")
+    parts.extend(f"(?:{p})" for p in _GLOBAL_PATTERNS)
+    if not parts:
+        return None
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+def matcher_for(rules_text: str):
+    matcher = _matchers.get(rules_text, MISSING)
+    if matcher is MISSING:
+        matcher = _matchers.set(rules_text, _compile_matcher(rules_text))
+    return matcher
+
+
+# ───────────── STAGES ─────────────
+# stage(text, norm, rules_text) -> verdict dict ya None (agla stage / LLM decide karega)
+
+def blocklist_stage(text, norm, rules_text):
+    matcher = matcher_for(rules_text)
+    if matcher is None:
+        return None
+    m = matcher.search(norm)
+    if not m:
+        return None
+    return _verdict("delete", f"Blocked term: {m.group(0)}", "blocklist", 3, True)
+
+
+def trivial_stage(text, norm, rules_text):
+    if len(norm) > PREFILTER_TRIVIAL_MAX_LEN:
+        return None
+    words = _WORD_RE.findall(norm)
+    # sirf emoji / punctuation
+    if not words:
+        return _verdict("allow", "Trivial message", "other", 1, False)
+    if all(w in TRIVIAL_WORDS or w.isdigit() for w in words):
+        return _verdict("allow", "Trivial message", "other", 1, False)
+    return None
+
+
+def register_stage(stage, first: bool = False):
+    if first:
+        _stages.insert(0, stage)
+    else:
+        _stages.append(stage)
+
+
+register_stage(blocklist_stage)
+register_stage(trivial_stage)
+
+
+def classify(text: str, rules_text: str = ""):
+    if not PREFILTER_ENABLED or not text:
+        return None
+
+    _stats["checked"] += 1
+    norm = normalize(text)
+    for stage in _stages:
+        verdict = stage(text, norm, rules_text or "")
+        if verdict is not None:
+            _stats["allowed" if verdict["action"] == "allow" else "deleted"] += 1
+            return verdict
+
+    _stats["passed"] += 1
+    return None
+
+
+def prefilter_stats():
+    avoided = _stats["allowed"] + _stats["deleted"]
+    return {**_stats, "llm_calls_avoided": avoided}
@@ -0,0 +1,117 @@
+import json
+import re
+
+from lru import LRUCache
+
+from config import PROMPT_RULES_TOKEN_BUDGET, PROMPT_RULE_MAX_TOKENS, PROMPT_MESSAGE_TOKEN_BUDGET
+from metrics import PROMPT_TOKENS
+
+# Gemini tokenizer call har prompt pe mehenga hai, budget ke liye chars/4 kaafi hai
+CHARS_PER_TOKEN = 4
+_RULES_CACHE_SIZE = 1024
+_SPACE_RE = re.compile(r"\s+")
+
+# rules_text -> compact rules block
+_rules_blocks = LRUCache(_RULES_CACHE_SIZE)
+_stats = {
+    "prompts": 0,
+    "prompt_tokens_est": 0,
+    "rules_cache_hits": 0,
+    "rules_cache_misses": 0,
+    "rules_truncated": 0,
+    "messages_truncated": 0,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    # shuru aur end dono rakho, spam links aksar message ke end me hote hain
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    head = limit * 2 // 3
+    tail = limit - head
+    return f"{text[:head]} …[{len(text) - limit} chars cut]… {text[-tail:]}"
+
+
+def _compact_rules(rules_text: str) -> str:
+    rules, seen = [], set()
+    for line in rules_text.splitlines():
+        rule = _SPACE_RE.sub(" ", line).strip()
+        if not rule or rule.casefold() in seen:
+            continue
+        seen.add(rule.casefold())
+        rules.append(truncate(rule, PROMPT_RULE_MAX_TOKENS))
+
+    if not rules:
+        return "(none)"
+
+    lines, used = [], 0
+    for i, rule in enumerate(rules, 1):
+        line = f"{i}. {rule}"
+        cost = estimate_tokens(line) + 1
+        if lines and used + cost > PROMPT_RULES_TOKEN_BUDGET:
+            # purane rules pehle add hue the, wahi rakhe jaate hain
+            lines.append(f"(+{len(rules) - i + 1} more rules omitted)")
+            _stats["rules_truncated"] += 1
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def rules_block(rules_text: str) -> str:
+    block = _rules_blocks.get(rules_text)
+    if block is not None:
+        _stats["rules_cache_hits"] += 1
+        return block
+    _stats["rules_cache_misses"] += 1
+    return _rules_blocks.set(rules_text, _compact_rules(rules_text or ""))
+
+
+def _message(text: str) -> str:
+    text = text or ""
+    short = truncate(text, PROMPT_MESSAGE_TOKEN_BUDGET)
+    if short is not text:
+        _stats["messages_truncated"] += 1
+    return short
+
+
+def _finish(prompt: str, kind: str) -> str:
+    tokens = estimate_tokens(prompt)
+    _stats["prompts"] += 1
+    _stats["prompt_tokens_est"] += tokens
+    PROMPT_TOKENS.observe(tokens, kind=kind)
+    return prompt
+
+
+# Static instructions model ke system_instruction me hain, yahan sirf per-call data
+def build_message_prompt(text, username, chat_title, rules_text):
+    return _finish(
+        f"RULES:\n{rules_block(rules_text)}\n"
+        f"CHAT: {truncate(chat_title, 32)}\n"
+        f"USER: {username}\n"
+        f"MESSAGE:\n{_message(text)}",
+        "single",
+    )
+
+
+def build_batch_prompt(messages, rules_text):
+    # messages: [{"id", "chat", "user", "message"}] - alag chats ho sakte hain, rules same
+    items = [{**m, "chat": truncate(m["chat"], 32), "message": _message(m["message"])} for m in messages]
+    return _finish(
+        f"RULES:\n{rules_block(rules_text)}\n"
+        f"MESSAGES:\n{json.dumps(items, ensure_ascii=False, separators=(',', ':'))}",
+        "batch",
+    )
+
+
+def build_appeal_prompt(text):
+    return _finish(f"USER APPEAL:\n{_message(text)}", "appeal")
+
+
+def prompt_stats():
+    return {**_stats, "rules_blocks": len(_rules_blocks)}
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+
+from telegram import ChatPermissions, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ParseMode
+
+from config import RAID_RESTRICT_CONCURRENCY, RAID_EDIT_INTERVAL, RAID_NOTICE_TTL
+from deletion_scheduler import deletion_scheduler
+from outbound import PRIORITY_LOW
+
+logger = logging.getLogger(__name__)
+
+MUTED = ChatPermissions(can_send_messages=False)
+
+# saare chats ke raid restricts milake itne parallel (outbound limiter phir bhi rate control karta hai)
+_restrict_slots = asyncio.Semaphore(RAID_RESTRICT_CONCURRENCY)
+
+
+async def restrict_many(bot, chat_id, user_ids):
+    async def _one(user_id):
+        async with _restrict_slots:
+            try:
+                await bot.restrict_chat_member(chat_id, user_id, permissions=MUTED)
+                return True
+            except Exception as e:
+                logger.warning("Raid restrict failed in %s for %s: %s", chat_id, user_id, e)
+                return False
+
+    results = await asyncio.gather(*(_one(uid) for uid in user_ids))
+    return sum(results)
+
+
+def _notice_html(pending):
+    return (
+        "🚨 <b>JOIN RAID DETECTED</b> 🚨\n\n"
+        f"<b>{pending}</b> new members are muted and pending verification.\n\n"
+        "<blockquote>New here? Tap below to verify yourself and start chatting.</blockquote>"
+    )
+
+
+class _Notice:
+    __slots__ = ("message_id", "pending", "expires_at", "ready", "edit_task")
+
+    def __init__(self, expires_at):
+        self.message_id = None
+        self.pending = 0
+        self.expires_at = expires_at
+        self.ready = asyncio.Event()
+        self.edit_task = None
+
+
+class RaidWelcome:
+    """During a join raid, one rolling "N members pending verification" message per chat
+    replaces the per-member welcome; edits are debounced to one per RAID_EDIT_INTERVAL."""
+
+    def __init__(self, edit_interval=RAID_EDIT_INTERVAL, notice_ttl=RAID_NOTICE_TTL):
+        self.edit_interval = edit_interval
+        self.notice_ttl = notice_ttl
+        self._notices = {}  # chat_id -> _Notice
+        self.stats = {"notices": 0, "edits": 0, "folded": 0}
+
+    def _expire(self, now):
+        for chat_id in [c for c, n in self._notices.items() if n.expires_at <= now]:
+            del self._notices[chat_id]
+
+    async def add(self, bot, chat_id, count, verify_link):
+        now = time.monotonic()
+        self._expire(now)
+
+        notice = self._notices.get(chat_id)
+        if notice is not None:
+            notice.pending += count
+            self.stats["folded"] += count
+            if notice.edit_task is None:
+                notice.edit_task = asyncio.create_task(self._edit_later(bot, chat_id, notice, verify_link))
+            return
+
+        notice = self._notices[chat_id] = _Notice(now + self.notice_ttl)
+        notice.pending = count
+        try:
+            sent = await bot.send_message(
+                chat_id,
+                _notice_html(notice.pending),
+                parse_mode=ParseMode.HTML,
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("✅ VERIFY NOW", url=verify_link)]]),
+                rate_limit_args={"priority": PRIORITY_LOW},
+            )
+        except Exception as e:
+            logger.warning("Raid notice failed in %s: %s", chat_id, e)
+            if self._notices.get(chat_id) is notice:
+                del self._notices[chat_id]
+            # send ke dauraan bana edit task ready ka wait kar raha hoga, use chhod ke mat jao
+            if notice.edit_task is not None:
+                notice.edit_task.cancel()
+            notice.ready.set()
+            return
+        notice.message_id = sent.message_id
+        notice.ready.set()
+        self.stats["notices"] += 1
+        # send ke dauraan aaye joins ka edit task ready ka wait kar raha hai
+        await deletion_scheduler.schedule(chat_id, sent.message_id, self.notice_ttl)
+
+    async def _edit_later(self, bot, chat_id, notice, verify_link):
+        try:
+            await asyncio.sleep(self.edit_interval)
+            await notice.ready.wait()
+            if notice.message_id is None:
+                return  # notice bheja hi nahi ja saka
+            shown = notice.pending
+            await bot.edit_message_text(
+                _notice_html(shown),
+                chat_id=chat_id,
+                message_id=notice.message_id,
+                parse_mode=ParseMode.HTML,
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("✅ VERIFY NOW", url=verify_link)]]),
+                rate_limit_args={"priority": PRIORITY_LOW},
+            )
+            self.stats["edits"] += 1
+        except Exception as e:
+            # admin ne notice delete kar diya ho to agla join naya notice bhejega
+            logger.info("Raid notice edit failed in %s: %s", chat_id, e)
+            if self._notices.get(chat_id) is notice:
+                del self._notices[chat_id]
+            return
+        finally:
+            notice.edit_task = None
+
+        if notice.pending != shown and self._notices.get(chat_id) is notice:
+            notice.edit_task = asyncio.create_task(self._edit_later(bot, chat_id, notice, verify_link))
+
+    def active(self) -> int:
+        return len(self._notices)
+
+
+raid_welcome = RaidWelcome()
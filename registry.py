@@ -0,0 +1,85 @@
+import logging
+import time
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from db import db
+from flusher import PeriodicFlusher
+from lru import LRUCache
+from metrics import MONGO_SECONDS, MONGO_ERRORS
+from config import REGISTRY_CACHE_SIZE, REGISTRY_FLUSH_INTERVAL, REGISTRY_FLUSH_MAX
+
+logger = logging.getLogger(__name__)
+
+
+class Registry(PeriodicFlusher):
+    """Write-behind upserts for users / groups.
+
+    Last written values ek LRU me rehte hain, same values dobara aaye to koi write nahi.
+    Real changes dirty map me jama hote hain aur ek unordered bulk_write se flush hote hain.
+    """
+
+    def __init__(self, collection, key_field, fields, max_size=REGISTRY_CACHE_SIZE,
+                 flush_interval=REGISTRY_FLUSH_INTERVAL, flush_max=REGISTRY_FLUSH_MAX):
+        super().__init__(flush_interval)
+        self.collection = collection
+        self.key_field = key_field
+        self.fields = fields
+        self.flush_max = flush_max
+        self._known = LRUCache(max_size)  # key -> values tuple (fields order)
+        self._dirty = {}  # key -> values tuple, flush ka wait
+        self.stats = {"recorded": 0, "skipped": 0, "written": 0, "flushes": 0, "errors": 0}
+
+    def dirty(self) -> int:
+        return len(self._dirty)
+
+    async def record(self, key, *values):
+        self.stats["recorded"] += 1
+        if self._known.get(key) == values:
+            self.stats["skipped"] += 1
+            return
+
+        self._known.set(key, values)
+        self._dirty[key] = values
+        if not await self.flush_if_idle() and len(self._dirty) >= self.flush_max:
+            self.wake()
+
+    def _ops(self, items):
+        now = datetime.utcnow()
+        return [
+            UpdateOne(
+                {self.key_field: key},
+                {
+                    "$set": {**dict(zip(self.fields, values)), "updated_at": now},
+                    "$setOnInsert": {"created_at": now},
+                },
+                upsert=True,
+            )
+            for key, values in items
+        ]
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        items, self._dirty = list(self._dirty.items()), {}
+        start = time.perf_counter()
+        try:
+            for i in range(0, len(items), self.flush_max):
+                chunk = items[i:i + self.flush_max]
+                await db[self.collection].bulk_write(self._ops(chunk), ordered=False)
+                self.stats["written"] += len(chunk)
+        except Exception as e:
+            # upserts idempotent hain: jo abhi tak dobara dirty nahi hua use agle flush me retry
+            self.stats["errors"] += 1
+            MONGO_ERRORS.inc(op="bulk_write")
+            logger.error("Registry flush to %s failed (%d docs): %s", self.collection, len(items), e)
+            for key, values in items:
+                self._dirty.setdefault(key, values)
+        finally:
+            MONGO_SECONDS.observe(time.perf_counter() - start, op="bulk_write")
+        self.stats["flushes"] += 1
+
+
+users_registry = Registry("users", "user_id", ("username",))
+groups_registry = Registry("groups", "chat_id", ("chat_id", "title", "added_by"))
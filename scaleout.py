@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+
+from config import SCALE_OUT_WORKERS, SCALE_OUT_BROKER, SCALE_OUT_QUEUE_SIZE, UPDATE_SHUTDOWN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Raw update JSON me chat in keys ke andar hota hai
+_CHAT_KEYS = (
+    "message", "edited_message", "channel_post", "edited_channel_post",
+    "business_message", "edited_business_message",
+    "chat_member", "my_chat_member", "chat_join_request",
+    "message_reaction", "message_reaction_count", "chat_boost", "removed_chat_boost",
+)
+_USER_KEYS = ("callback_query", "inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query")
+
+
+def routing_key(data: dict) -> int:
+    for key in _CHAT_KEYS:
+        obj = data.get(key)
+        if obj and "chat" in obj:
+            return obj["chat"]["id"]
+    cq = data.get("callback_query")
+    if cq and cq.get("message", {}).get("chat"):
+        return cq["message"]["chat"]["id"]
+    for key in _USER_KEYS:
+        obj = data.get(key)
+        if obj and "from" in obj:
+            return obj["from"]["id"]
+    return data.get("update_id", 0)
+
+
+# ───────────── BROKERS ─────────────
+# broker.try_publish(shard, payload) -> bool / broker.publish(shard, payload, timeout) -> bool
+# broker.consume(shard) -> payload (None = stop)
+
+class InMemoryBroker:
+    """Same-process stand-in: shards are asyncio queues consumed by local tasks."""
+
+    in_process = True
+
+    def __init__(self, shards: int, maxsize: int = SCALE_OUT_QUEUE_SIZE):
+        self._queues = [asyncio.Queue(maxsize=maxsize) for _ in range(shards)]
+
+    def try_publish(self, shard: int, payload) -> bool:
+        try:
+            self._queues[shard].put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def publish(self, shard: int, payload, timeout=None) -> bool:
+        try:
+            await asyncio.wait_for(self._queues[shard].put(payload), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def consume(self, shard: int):
+        return await self._queues[shard].get()
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+
+class ProcessBroker:
+    """multiprocessing queues between the ingress process and worker processes."""
+
+    in_process = False
+
+    def __init__(self, shards: int, maxsize: int = SCALE_OUT_QUEUE_SIZE):
+        ctx = multiprocessing.get_context("spawn")
+        self._queues = [ctx.Queue(maxsize=maxsize) for _ in range(shards)]
+
+    def try_publish(self, shard: int, payload) -> bool:
+        try:
+            self._queues[shard].put_nowait(payload)
+            return True
+        except queue.Full:
+            return False
+
+    async def publish(self, shard: int, payload, timeout=None) -> bool:
+        if self.try_publish(shard, payload):
+            return True
+        # worker peeche hai -> ingress ruk ke wait kare, par timeout tak hi (executor thread hamesha ke liye block na ho)
+        q = self._queues[shard]
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, q.put, payload, True, timeout)
+            return True
+        except queue.Full:
+            return False
+
+    async def consume(self, shard: int):
+        return await asyncio.get_running_loop().run_in_executor(None, self._queues[shard].get)
+
+    def depth(self) -> int:
+        try:
+            return sum(q.qsize() for q in self._queues)
+        except NotImplementedError:  # macOS pe qsize nahi hota
+            return -1
+
+
+BROKERS = {"memory": InMemoryBroker, "process": ProcessBroker}
+
+
+def _worker_entry(shard: int, broker):
+    # Ctrl+C ingress handle karega, worker ko stop sentinel milega
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO)
+
+    import main  # har worker process ka apna PTB Application
+
+    asyncio.run(main.run_worker(shard, broker))
+
+
+class ScaleOut:
+    """Routes raw updates by chat_id to N workers; each chat always lands on the same worker."""
+
+    def __init__(self, num_workers=SCALE_OUT_WORKERS, broker=None):
+        self.num_workers = num_workers
+        # broker start() pe banta hai, taaki worker process me "import main" pe queues na banein
+        self.broker = broker
+        self._broker_cls = type(broker) if broker is not None else BROKERS[SCALE_OUT_BROKER]
+        self._workers = []
+        self.stats = {"routed": 0, "rejected": 0}
+
+    @property
+    def in_process(self) -> bool:
+        return self._broker_cls.in_process
+
+    def shard_for(self, data: dict) -> int:
+        return routing_key(data) % self.num_workers
+
+    def start(self, local_consumer=None):
+        if self.broker is None:
+            self.broker = self._broker_cls(self.num_workers)
+        if self.in_process:
+            self._workers = [
+                asyncio.create_task(local_consumer(shard, self.broker)) for shard in range(self.num_workers)
+            ]
+            return
+
+        ctx = multiprocessing.get_context("spawn")
+        for shard in range(self.num_workers):
+            proc = ctx.Process(target=_worker_entry, args=(shard, self.broker), name=f"webhook-worker-{shard}", daemon=False)
+            proc.start()
+            self._workers.append(proc)
+        logger.info("Started %d webhook worker processes", self.num_workers)
+
+    def try_route(self, data: dict) -> bool:
+        if self.broker.try_publish(self.shard_for(data), data):
+            self.stats["routed"] += 1
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    async def route(self, data: dict, timeout=None) -> bool:
+        routed = await self.broker.publish(self.shard_for(data), data, timeout)
+        if routed:
+            self.stats["routed"] += 1
+        return routed
+
+    def depth(self) -> int:
+        return self.broker.depth() if self.broker is not None else 0
+
+    async def stop(self, timeout=UPDATE_SHUTDOWN_TIMEOUT):
+        if self.broker is None:
+            return
+        for shard in range(self.num_workers):
+            await self.broker.publish(shard, None)
+
+        if self.in_process:
+            await asyncio.wait(self._workers, timeout=timeout)
+            for task in self._workers:
+                task.cancel()
+        else:
+            loop = asyncio.get_running_loop()
+            for proc in self._workers:
+                await loop.run_in_executor(None, proc.join, timeout)
+                if proc.is_alive():
+                    logger.warning("Worker %s did not exit in %ss, terminating", proc.name, timeout)
+                    proc.terminate()
+        self._workers = []
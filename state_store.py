@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, ReturnDocument
+
+from db import db
+from lru import LRUCache, MISSING
+from metrics import instrument, MONGO_SECONDS, MONGO_ERRORS
+from config import STATE_CACHE_TTL, STATE_CACHE_SIZE
+
+_stores = []
+
+
+def _doc_id(key):
+    # (group_id, user_id) jaise tuple keys -> "gid:uid"
+    if isinstance(key, tuple):
+        return ":".join(str(k) for k in key)
+    return str(key)
+
+
+class StateStore:
+    """Mongo-backed key/value state with TTL expiry and a short in-memory read-through cache.
+
+    Har worker process apna cache rakhta hai, isliye cache_ttl chhota rakho;
+    writes Mongo me atomic hote hain aur local cache bhi update karte hain.
+    """
+
+    def __init__(self, name: str, ttl: int, cache_ttl=STATE_CACHE_TTL, cache_size=STATE_CACHE_SIZE):
+        self.name = name
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.coll = db[f"state_{name}"]
+        self._cache = LRUCache(cache_size, ttl=cache_ttl)  # doc_id -> value
+        _stores.append(self)
+
+    def _expires_at(self):
+        return datetime.utcnow() + timedelta(seconds=self.ttl)
+
+    # cache hits Mongo latency me count na hon, isliye get me sirf load instrumented hai
+    @instrument(MONGO_SECONDS, MONGO_ERRORS, op="state_get")
+    async def _load(self, doc_id):
+        return await self.coll.find_one({"_id": doc_id})
+
+    async def get(self, key, default=None):
+        doc_id = _doc_id(key)
+        value = self._cache.get(doc_id, MISSING)
+        if value is not MISSING:
+            return value
+
+        doc = await self._load(doc_id)
+        # TTL monitor late chalta hai, expired doc ko missing maano
+        if not doc or doc["expires_at"] <= datetime.utcnow():
+            return default
+        self._cache.set(doc_id, doc["value"])
+        return doc["value"]
+
+    @instrument(MONGO_SECONDS, MONGO_ERRORS, op="state_set")
+    async def set(self, key, value):
+        doc_id = _doc_id(key)
+        await self.coll.update_one(
+            {"_id": doc_id},
+            {"$set": {"value": value, "expires_at": self._expires_at()}},
+            upsert=True,
+        )
+        self._cache.set(doc_id, value)
+
+    @instrument(MONGO_SECONDS, MONGO_ERRORS, op="state_pop")
+    async def pop(self, key, default=None):
+        doc_id = _doc_id(key)
+        self._cache.pop(doc_id)
+        doc = await self.coll.find_one_and_delete({"_id": doc_id})
+        if not doc or doc["expires_at"] <= datetime.utcnow():
+            return default
+        return doc["value"]
+
+    @instrument(MONGO_SECONDS, MONGO_ERRORS, op="state_delete")
+    async def delete(self, key):
+        doc_id = _doc_id(key)
+        self._cache.pop(doc_id)
+        await self.coll.delete_one({"_id": doc_id})
+
+    @instrument(MONGO_SECONDS, MONGO_ERRORS, op="state_incr")
+    async def incr(self, key, amount: int = 1):
+        doc_id = _doc_id(key)
+        doc = await self.coll.find_one_and_update(
+            {"_id": doc_id},
+            {"$inc": {"value": amount}, "$set": {"expires_at": self._expires_at()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._cache.set(doc_id, doc["value"])
+        return doc["value"]
+
+    @instrument(MONGO_SECONDS, MONGO_ERRORS, op="state_add_to_set")
+    async def add_to_set(self, key, member):
+        doc_id = _doc_id(key)
+        doc = await self.coll.find_one_and_update(
+            {"_id": doc_id},
+            {"$addToSet": {"value": member}, "$set": {"expires_at": self._expires_at()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._cache.set(doc_id, doc["value"])
+        return doc["value"]
+
+    @instrument(MONGO_SECONDS, MONGO_ERRORS, op="state_ensure_index")
+    async def ensure_index(self):
+        await self.coll.create_index(
+            [("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0
+        )
+
+
+async def ensure_state_indexes():
+    for store in _stores:
+        await store.ensure_index()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+# config / db import se pehle env set karo (benchmark.py jaisa), koi real Mongo / Telegram nahi
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("MONGO_URI", "mongodb://test.invalid")
+os.environ.setdefault("WEBHOOK_HOST", "https://test.invalid")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+import bench_fakes  # noqa: E402
+import db as db_module  # noqa: E402
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    # modules `from db import db` karte hain, isliye jo module test kare wahan bhi patch karo
+    database = bench_fakes.FakeDatabase()
+    monkeypatch.setattr(db_module, "db", database)
+    return database
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+import analytics
+import bench_fakes
+
+TS = datetime(2024, 1, 1, 12, 30)
+
+
+class FlakyCollection(bench_fakes.FakeCollection):
+    """bulk_write ke chune hue ops fail karta hai, baaki apply hote hain (unordered bulk jaisa)."""
+
+    fail_indexes = frozenset()
+    fail_with = None
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail_with is not None:
+            err, self.fail_with = self.fail_with, None
+            raise err
+        failed, self.fail_indexes = self.fail_indexes, frozenset()
+        await super().bulk_write([r for i, r in enumerate(requests) if i not in failed], ordered)
+        if failed:
+            errors = [{"index": i, "code": 2, "errmsg": "injected"} for i in sorted(failed)]
+            raise BulkWriteError({"writeErrors": errors, "nUpserted": len(requests) - len(failed)})
+
+
+def _rollups(monkeypatch):
+    database = bench_fakes.FakeDatabase()
+    coll = database._collections["analytics_hourly"] = FlakyCollection(database, "analytics_hourly")
+    monkeypatch.setattr(analytics, "db", database)
+    return analytics.Rollups(flush_interval=3600), coll
+
+
+def _totals(coll):
+    return {doc["chat_id"]: doc["total"] for doc in coll._docs.values()}
+
+
+def test_partial_failure_retries_only_failed_docs(monkeypatch):
+    rollups, coll = _rollups(monkeypatch)
+
+    async def scenario():
+        rollups.start()
+        for chat_id in (1, 2, 3):
+            await rollups.record(chat_id, "delete", "spam", ts=TS)
+        coll.fail_indexes = {1}  # chat 2 ka doc fail
+        await rollups.flush()
+        assert _totals(coll) == {1: 1, 3: 1}
+        assert rollups.stats["errors"] == 1
+        assert sum(rollups._pending.values()) == 1
+        await rollups.stop()
+
+    asyncio.run(scenario())
+    # retry me sirf chat 2, baaki double count nahi hue
+    assert _totals(coll) == {1: 1, 2: 1, 3: 1}
+    assert rollups.stats["dropped"] == 0
+
+
+def test_no_server_requeues_whole_batch(monkeypatch):
+    rollups, coll = _rollups(monkeypatch)
+
+    async def scenario():
+        rollups.start()
+        await rollups.record(1, "warn", ts=TS)
+        await rollups.record(1, "warn", ts=TS)
+        coll.fail_with = ServerSelectionTimeoutError("no server")
+        await rollups.flush()
+        assert _totals(coll) == {}
+        assert sum(rollups._pending.values()) == 2
+        await rollups.stop()
+
+    asyncio.run(scenario())
+    assert _totals(coll) == {1: 2}
+
+
+def test_unknown_outcome_is_dropped(monkeypatch):
+    rollups, coll = _rollups(monkeypatch)
+
+    async def scenario():
+        rollups.start()
+        await rollups.record(1, "ban", ts=TS)
+        coll.fail_with = TimeoutError("network timeout")
+        await rollups.flush()
+        await rollups.stop()
+
+    asyncio.run(scenario())
+    # commit hua ya nahi pata nahi -> dobara $inc nahi bhejte
+    assert _totals(coll) == {}
+    assert rollups.stats["dropped"] == 1
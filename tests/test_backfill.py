@@ -0,0 +1,64 @@
+import asyncio
+import collections
+import json
+
+import backfill
+import bench_fakes
+import moderation
+
+TEXTS = [
+    "is this group about python packaging?",
+    "claim your scam airdrop right now",
+    "what time is the community call today",
+    "anyone tried the new release candidate",
+    "spam spam spam visit my profile",
+    "thanks for the detailed answer earlier friend",
+]
+
+
+def _write_input(path):
+    with open(path, "w", encoding="utf-8") as fh:
+        for i, text in enumerate(TEXTS, 1):
+            fh.write(json.dumps({"chat_id": -100, "user_id": i, "username": f"u{i}", "text": text, "id": i}) + "\n")
+
+
+def _run(argv):
+    return asyncio.run(backfill.Backfill(backfill.parse_args(argv)).run())
+
+
+def test_resume_after_interrupt(tmp_path, monkeypatch):
+    stats = collections.defaultdict(int)
+    model = bench_fakes.FakeGeminiModel(stats=stats)
+    monkeypatch.setattr(moderation, "moderation_model", model)
+    monkeypatch.setattr(moderation, "escalation_model", model)
+
+    src, out = tmp_path / "export.jsonl", tmp_path / "verdicts.jsonl"
+    _write_input(src)
+    argv = [str(src), "-o", str(out), "--concurrency", "2", "--checkpoint-every", "1"]
+
+    first = _run(argv + ["--limit", "3"])
+    assert first["lines"] == 3
+    assert json.loads((tmp_path / "verdicts.jsonl.ckpt").read_text())["line"] == 3
+    # checkpoint ke baad crash se adhi likhi line, resume pe hatni chahiye
+    with open(out, "a", encoding="utf-8") as fh:
+        fh.write('{"line": 4, "act')
+
+    calls_before = stats["calls"]
+    second = _run(argv)
+    assert second["lines"] == 3
+    assert stats["calls"] - calls_before == 3  # pehli 3 lines dobara moderate nahi hui
+
+    rows = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["line"] for r in rows] == [1, 2, 3, 4, 5, 6]
+    assert [r["action"] for r in rows] == ["allow", "delete", "allow", "allow", "delete", "allow"]
+
+
+def test_no_resume_starts_over(tmp_path, monkeypatch):
+    monkeypatch.setattr(moderation, "moderation_model", bench_fakes.FakeGeminiModel())
+    src, out = tmp_path / "export.jsonl", tmp_path / "verdicts.jsonl"
+    _write_input(src)
+
+    _run([str(src), "-o", str(out), "--limit", "2"])
+    summary = _run([str(src), "-o", str(out), "--no-resume"])
+    assert summary["lines"] == len(TEXTS)
+    assert len(out.read_text(encoding="utf-8").splitlines()) == len(TEXTS)
@@ -0,0 +1,90 @@
+from flood import DEFAULT_LIMITS, FloodShield, SlidingWindow
+
+LIMITS = {**DEFAULT_LIMITS, "messages": 3, "window": 10, "duplicates": 2, "chat_duplicates": 3,
+          "dup_window": 30, "joins": 5, "join_window": 10}
+
+
+def test_sliding_window_counts_within_window():
+    w = SlidingWindow(0.0)
+    assert w.hit(0.0, 10) == 1
+    assert w.hit(5.0, 10) == 2
+
+
+def test_sliding_window_weights_previous_bucket():
+    w = SlidingWindow(0.0)
+    for _ in range(4):
+        w.hit(1.0, 10)
+    # 15s pe: prev=4 ka aadha (5/10 window bacha) + curr=1
+    assert w.hit(15.0, 10) == 4 * 0.5 + 1
+
+
+def test_sliding_window_resets_after_two_windows():
+    w = SlidingWindow(0.0)
+    for _ in range(4):
+        w.hit(1.0, 10)
+    assert w.hit(25.0, 10) == 1
+
+
+def test_rate_limit():
+    shield = FloodShield()
+    for i in range(3):
+        assert shield.check_message(1, 7, f"message number {i}", LIMITS, now=float(i)) is None
+    assert shield.check_message(1, 7, "message number 3", LIMITS, now=3.0).startswith("flood: more than 3")
+    # doosra user same chat me unaffected
+    assert shield.check_message(1, 8, "hello there friend", LIMITS, now=3.0) is None
+
+
+def test_user_duplicates():
+    shield = FloodShield()
+    limits = {**LIMITS, "messages": 100}
+    assert shield.check_message(1, 7, "Buy now", limits, now=0.0) is None
+    assert shield.check_message(1, 7, "buy NOW ", limits, now=1.0) is None
+    assert "repeated 3 times" in shield.check_message(1, 7, "buy now", limits, now=2.0)
+
+
+def test_chat_duplicates_across_users():
+    shield = FloodShield()
+    text = "join my channel for free coins"
+    for user_id in range(3):
+        assert shield.check_message(1, user_id, text, LIMITS, now=float(user_id)) is None
+    assert shield.check_message(1, 99, text, LIMITS, now=3.0) == "flood: same message posted by many users"
+    # window ke baad count dobara shuru
+    assert shield.check_message(1, 100, text, LIMITS, now=40.0) is None
+
+
+def test_short_texts_not_chat_duplicates():
+    shield = FloodShield()
+    for user_id in range(10):
+        assert shield.check_message(1, user_id, "gm", LIMITS, now=0.0) is None
+
+
+def test_disabled_limits():
+    shield = FloodShield()
+    off = {**LIMITS, "enabled": False}
+    for i in range(10):
+        assert shield.check_message(1, 7, "same", off, now=0.0) is None
+    assert shield.record_join(1, count=50, limits=off, now=0.0) is False
+    assert shield.in_raid(1, now=0.0) is False
+
+
+def test_mark_muted():
+    shield = FloodShield()
+    shield.mark_muted(1, 7, 60, now=0.0)
+    assert shield.check_message(1, 7, "hi", LIMITS, now=30.0) == "flood (already muted)"
+    assert shield.check_message(1, 7, "hi", LIMITS, now=61.0) is None
+
+
+def test_join_burst():
+    shield = FloodShield()
+    assert shield.record_join(1, count=5, limits=LIMITS, now=0.0) is False
+    assert shield.record_join(1, count=1, limits=LIMITS, now=1.0) is True
+    assert shield.in_raid(1, now=5.0) is True
+    assert shield.in_raid(1, now=12.0) is False
+    assert shield.stats["join_bursts"] == 1
+
+
+def test_tracked_state_is_bounded():
+    shield = FloodShield(max_tracked=4)
+    for user_id in range(10):
+        shield.check_message(1, user_id, "some normal text", LIMITS, now=0.0)
+    assert shield.tracked()["users"] == 4
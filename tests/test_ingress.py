@@ -0,0 +1,66 @@
+from ingress import UpdateIdFilter
+
+
+def test_retry_is_duplicate():
+    f = UpdateIdFilter(window=64)
+    assert f.seen(100) is False
+    assert f.seen(101) is False
+    assert f.seen(100) is True
+    assert f.seen(101) is True
+
+
+def test_out_of_order_within_window():
+    f = UpdateIdFilter(window=64)
+    assert f.seen(200) is False
+    assert f.seen(190) is False
+    assert f.seen(190) is True
+
+
+def test_window_slides_forward():
+    f = UpdateIdFilter(window=64)
+    f.seen(1)
+    f.seen(2)
+    # 64 aage -> id 1 window se bahar, uska bit naye id ke liye clear hua
+    assert f.seen(65) is False
+    assert f.seen(66) is False
+    assert f.seen(66) is True
+
+
+def test_single_stray_old_id_is_dropped_without_reset():
+    f = UpdateIdFilter(window=64)
+    for uid in range(1000, 1010):
+        f.seen(uid)
+    assert f.seen(5) is True  # late retry of an ancient update
+    assert f.resets == 0
+    # filter abhi bhi purane sequence pe hai
+    assert f.seen(1005) is True
+    assert f.seen(1010) is False
+
+
+def test_repeated_same_stray_id_does_not_reset():
+    f = UpdateIdFilter(window=64)
+    f.seen(1000)
+    assert f.seen(5) is True
+    assert f.seen(5) is True
+    assert f.resets == 0
+
+
+def test_two_close_old_ids_reset_the_sequence():
+    f = UpdateIdFilter(window=64)
+    for uid in range(1000, 1010):
+        f.seen(uid)
+    # Telegram ne naya (chhota) update_id sequence shuru kiya
+    assert f.seen(10) is True
+    assert f.seen(11) is False
+    assert f.resets == 1
+    assert f.seen(10) is True
+    assert f.seen(11) is True
+    assert f.seen(12) is False
+
+
+def test_two_far_apart_old_ids_do_not_reset():
+    f = UpdateIdFilter(window=64)
+    f.seen(10_000)
+    assert f.seen(5) is True
+    assert f.seen(5_000) is True
+    assert f.resets == 0
@@ -0,0 +1,33 @@
+from lru import LRUCache, MISSING
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" ab recent hai
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
+
+
+def test_ttl_and_per_entry_override():
+    cache = LRUCache(10, ttl=60)
+    cache.set("roster", frozenset({1}), now=0.0)
+    cache.set("failed", None, ttl=5, now=0.0)
+    assert cache.get("failed", MISSING, now=4.0) is None  # cached failure, value None
+    assert cache.get("failed", MISSING, now=6.0) is MISSING
+    assert cache.get("roster", now=59.0) == frozenset({1})
+    assert cache.get("roster", now=60.0) is None
+    assert len(cache) == 0
+
+
+def test_get_or_create():
+    cache = LRUCache(10)
+    made = []
+    first = cache.get_or_create("k", lambda: made.append(1) or [])
+    assert cache.get_or_create("k", lambda: made.append(1) or []) is first
+    assert made == [1]
+    assert cache.pop("k") is first
+    assert cache.pop("k", "gone") == "gone"
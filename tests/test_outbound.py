@@ -0,0 +1,87 @@
+import asyncio
+
+from outbound import (
+    OutboundRateLimiter,
+    TokenBucket,
+    PRIORITY_CRITICAL,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+)
+
+
+def test_token_bucket_refill():
+    bucket = TokenBucket(rate=2, capacity=2, now=0.0)
+    assert bucket.wait_time(0.0) == 0.0
+    bucket.take(0.0)
+    bucket.take(0.0)
+    assert bucket.wait_time(0.0) == 0.5
+    assert bucket.wait_time(0.5) == 0.0
+    bucket.take(0.5)
+    # capacity se zyada jama nahi hota
+    assert bucket.wait_time(100.0) == 0.0
+    assert bucket.tokens == 2
+
+
+def test_token_bucket_pause():
+    bucket = TokenBucket(rate=10, capacity=10, now=0.0)
+    bucket.pause(5.0)
+    bucket.pause(3.0)  # chhota pause pehle wale ko kam nahi karta
+    assert bucket.wait_time(1.0) == 4.0
+    assert bucket.wait_time(5.0) == 0.0
+
+
+def test_limiter_initialize_twice_keeps_pump():
+    async def scenario():
+        limiter = OutboundRateLimiter(global_rate=0.5)
+        await limiter.initialize()
+        pump = limiter._pump_task
+        await limiter.initialize()
+        assert limiter._pump_task is pump
+        # rate < 1 pe bhi bucket me ek token aa sakta hai
+        assert limiter._global.capacity == 1
+        await limiter.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_pump_releases_by_priority():
+    async def scenario():
+        limiter = OutboundRateLimiter(global_rate=100)
+        await limiter.initialize()
+        loop = asyncio.get_running_loop()
+        limiter._global.pause(loop.time() + 0.05)
+
+        order = []
+
+        async def acquire(priority, name):
+            await limiter._acquire(priority, None)
+            order.append(name)
+
+        tasks = [
+            asyncio.create_task(acquire(PRIORITY_LOW, "notice")),
+            asyncio.create_task(acquire(PRIORITY_NORMAL, "reply")),
+            asyncio.create_task(acquire(PRIORITY_CRITICAL, "ban")),
+        ]
+        await asyncio.wait_for(asyncio.gather(*tasks), 2)
+        await limiter.shutdown()
+        return order
+
+    assert asyncio.run(scenario()) == ["ban", "reply", "notice"]
+
+
+def test_pump_skips_chat_at_limit():
+    async def scenario():
+        limiter = OutboundRateLimiter(global_rate=100, group_per_min=20)
+        await limiter.initialize()
+        loop = asyncio.get_running_loop()
+        limiter._chat_bucket(-100, loop.time()).tokens = 0  # ye group apni per-minute limit pe hai
+
+        busy = asyncio.create_task(limiter._acquire(PRIORITY_CRITICAL, -100))
+        other = asyncio.create_task(limiter._acquire(PRIORITY_LOW, -200))
+        await asyncio.wait_for(other, 1)
+        assert not busy.done()
+        assert limiter.queue_depth() == 1
+        busy.cancel()
+        await limiter.shutdown()
+
+    asyncio.run(scenario())
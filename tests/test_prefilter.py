@@ -0,0 +1,44 @@
+import prefilter
+
+RULES = "No spam\nblock: casino, bet365, free money\nregex: .*"
+
+
+def test_trivial_messages_allowed():
+    for text in ("ok", "GM bhai", "thanks!!", "👍👍", "+1", "12345"):
+        verdict = prefilter.classify(text, "")
+        assert verdict["action"] == "allow", text
+        assert verdict["source"] == "prefilter"
+
+
+def test_normal_messages_go_to_llm():
+    assert prefilter.classify("can someone explain how the bot decides warnings?", RULES) is None
+    assert prefilter.classify("ok but why", "") is None
+
+
+def test_block_terms_delete():
+    verdict = prefilter.classify("Join the best CASINO today", RULES)
+    assert verdict["action"] == "delete"
+    assert verdict["should_delete"] is True
+    assert verdict["reason"] == "Blocked term: casino"
+    assert prefilter.classify("get free money here", RULES)["action"] == "delete"
+
+
+def test_block_terms_match_whole_words_only():
+    assert prefilter.classify("my casinoroyale review of the movie", RULES) is None
+
+
+def test_chat_regex_rules_are_not_compiled():
+    # "regex:" chat rules ignore hote hain, warna ".*" har message delete kar deta
+    assert prefilter.classify("a perfectly normal question here?", RULES) is None
+
+
+def test_rule_kind():
+    assert prefilter.rule_kind("block: a, b") == "block"
+    assert prefilter.rule_kind("Regex: x+") == "regex"
+    assert prefilter.rule_kind("block:") is None
+    assert prefilter.rule_kind("be nice to everyone") is None
+
+
+def test_matcher_cached_per_rules_text():
+    assert prefilter.matcher_for(RULES) is prefilter.matcher_for(RULES)
+    assert prefilter.matcher_for("no block rules here") is None
@@ -0,0 +1,64 @@
+import asyncio
+
+from verdict_cache import VerdictCache, cache_key
+
+ALLOW = {"action": "allow", "reason": "ok", "source": "gemini"}
+
+
+def test_cache_key_normalizes_text():
+    assert cache_key("FREE  coins\n", "rules") == cache_key("free coins", "rules")
+    assert cache_key("free coins", "rules") != cache_key("free coins", "other rules")
+
+
+def test_parallel_identical_messages_share_one_call():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return dict(ALLOW)
+
+    async def scenario():
+        cache = VerdictCache(ttl=60, max_size=10, persist=False)
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        again = await cache.get_or_compute("k", compute)
+        return cache, results, again
+
+    cache, results, again = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [r["source"] for r in results].count("gemini") == 1
+    assert cache.stats["coalesced"] == 4
+    assert again["source"] == "cache"
+    assert cache.stats["hits"] == 1
+
+
+def test_error_verdict_not_cached():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"action": "allow", "reason": "AI error", "source": "error"}
+
+    async def scenario():
+        cache = VerdictCache(ttl=60, max_size=10, persist=False)
+        await cache.get_or_compute("k", compute)
+        await cache.get_or_compute("k", compute)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_failure_propagates_to_waiters_and_is_not_cached():
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("gemini down")
+
+    async def scenario():
+        cache = VerdictCache(ttl=60, max_size=10, persist=False)
+        results = await asyncio.gather(*(cache.get_or_compute("k", boom) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache._inflight == {}
+        return await cache.get_or_compute("k", lambda: asyncio.sleep(0, dict(ALLOW)))
+
+    assert asyncio.run(scenario())["source"] == "gemini"
@@ -0,0 +1,38 @@
+import asyncio
+
+from workers import ShardedDispatcher
+
+
+class _Update:
+    def __init__(self, update_id, chat_id):
+        self.update_id = update_id
+        self.effective_chat = type("Chat", (), {"id": chat_id})()
+        self.effective_user = None
+
+
+def test_detached_work_does_not_block_shard():
+    done = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_reply(uid):
+            await release.wait()  # chat ka outbound bucket khali hai
+            done.append(("reply", uid))
+
+        async def process(update):
+            if update.update_id == 1:
+                dispatcher.detach(slow_reply(update.update_id))
+            done.append(("update", update.update_id))
+
+        dispatcher = ShardedDispatcher(process, num_workers=1)
+        dispatcher.start()
+        for uid, chat_id in ((1, -1), (2, -2), (3, -1)):
+            await dispatcher.submit(_Update(uid, chat_id))
+        await asyncio.sleep(0.01)
+        assert done == [("update", 1), ("update", 2), ("update", 3)]
+        release.set()
+        await dispatcher.stop(timeout=1)
+
+    asyncio.run(scenario())
+    assert done[-1] == ("reply", 1)
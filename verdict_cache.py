@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import logging
+import re
+
+from lru import LRUCache
+from config import VERDICT_CACHE_TTL, VERDICT_CACHE_SIZE, VERDICT_CACHE_PERSIST
+from prefilter import normalize
+
+logger = logging.getLogger(__name__)
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def cache_key(text: str, rules_text: str) -> str:
+    # copy-paste spam me extra spaces / case alag hota hai, isliye normalized text hash
+    norm = _SPACES_RE.sub(" ", normalize(text))
+    return f"{_digest(norm)}:{_digest(rules_text or '')}"
+
+
+class VerdictCache:
+    """Two-tier (memory LRU + optional Mongo) cache of LLM verdicts keyed by message/rules hash."""
+
+    def __init__(self, ttl=VERDICT_CACHE_TTL, max_size=VERDICT_CACHE_SIZE, persist=VERDICT_CACHE_PERSIST):
+        self.ttl = ttl
+        self.persist = persist
+        self._entries = LRUCache(max_size, ttl=ttl)  # key -> verdict
+        self._inflight = {}
+        self.stats = {"hits": 0, "db_hits": 0, "misses": 0, "coalesced": 0}
+
+    async def get(self, key):
+        verdict = self._entries.get(key)
+        if verdict is not None:
+            self.stats["hits"] += 1
+            return verdict
+
+        if self.persist:
+            from models import get_cached_verdict
+            try:
+                verdict = await get_cached_verdict(key)
+            except Exception as e:
+                logger.warning("Verdict cache read failed: %s", e)
+                verdict = None
+            if verdict is not None:
+                self.stats["db_hits"] += 1
+                self._entries.set(key, verdict)
+                return verdict
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key, verdict):
+        self._entries.set(key, verdict)
+        if self.persist:
+            from models import save_cached_verdict
+            try:
+                await save_cached_verdict(key, verdict, self.ttl)
+            except Exception as e:
+                logger.warning("Verdict cache write failed: %s", e)
+
+    async def get_or_compute(self, key, compute):
+        cached = await self.get(key)
+        if cached is not None:
+            return {**cached, "source": "cache"}
+
+        # spam raid: same text ke parallel messages pehli call ka result share karte hain
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            verdict = await asyncio.shield(fut)
+            return {**verdict, "source": "cache"}
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            verdict = await compute()
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # waiters na ho to "never retrieved" warning na aaye
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        fut.set_result(verdict)
+        # AI error default ko cache nahi karte, agla message dobara try karega
+        if verdict.get("source") != "error":
+            await self.put(key, verdict)
+        return verdict
+
+
+verdict_cache = VerdictCache()
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+from config import UPDATE_WORKERS, UPDATE_QUEUE_SIZE, UPDATE_SHUTDOWN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def shard_key(update):
+    # same chat ke updates hamesha same worker pe -> chat ke andar order maintain
+    chat = update.effective_chat
+    if chat is not None:
+        return chat.id
+    user = update.effective_user
+    if user is not None:
+        return user.id
+    return update.update_id
+
+
+class ShardedDispatcher:
+    """Runs updates on N worker tasks, sharded by chat_id (ordered per chat, parallel across chats)."""
+
+    def __init__(self, process, num_workers=UPDATE_WORKERS, queue_size=UPDATE_QUEUE_SIZE):
+        self.process = process
+        self.num_workers = max(1, num_workers)
+        self._queues = [asyncio.Queue(maxsize=queue_size) for _ in range(self.num_workers)]
+        self._tasks = []
+        self._detached = set()
+        self.stats = {"processed": 0, "errors": 0, "rejected": 0, "detached": 0}
+
+    def _queue_for(self, update):
+        return self._queues[shard_key(update) % self.num_workers]
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(q)) for q in self._queues]
+
+    async def submit(self, update):
+        # queue full ho to caller yahi wait karega (backpressure)
+        await self._queue_for(update).put(update)
+
+    def try_submit(self, update) -> bool:
+        try:
+            self._queue_for(update).put_nowait(update)
+            return True
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return False
+
+    def detach(self, coro):
+        # shard ke bahar chalo: jaise command reply jo chat ke outbound bucket pe ruk sakta hai,
+        # us wait ke peeche is shard ke doosre chats nahi atakne chahiye. stop() inka bhi wait karta hai
+        task = asyncio.create_task(coro)
+        self._detached.add(task)
+        task.add_done_callback(self._detached_done)
+        self.stats["detached"] += 1
+        return task
+
+    def _detached_done(self, task):
+        self._detached.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+            logger.error("Error in detached handler: %s", task.exception(), exc_info=task.exception())
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def depths(self):
+        return [q.qsize() for q in self._queues]
+
+    def waiting_elsewhere(self, keys) -> int:
+        # kitne doosre shards pe updates queue me hain; keys ke apne shards ka backlog
+        # unke current message ke baad hi chalega, isliye wo count nahi hote
+        own = {key % self.num_workers for key in keys if key is not None}
+        return sum(1 for i, q in enumerate(self._queues) if i not in own and q.qsize())
+
+    async def _worker(self, queue):
+        while True:
+            update = await queue.get()
+            try:
+                if update is _STOP:
+                    return
+                await self.process(update)
+                self.stats["processed"] += 1
+            except Exception as ex:
+                self.stats["errors"] += 1
+                logger.exception("Error processing update: %s", ex)
+            finally:
+                queue.task_done()
+
+    async def stop(self, timeout=UPDATE_SHUTDOWN_TIMEOUT):
+        if not self._tasks:
+            return
+        # pending updates process hone do, phir har worker ko stop sentinel
+        for q in self._queues:
+            await q.put(_STOP)
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("%d update workers did not finish in %ss, cancelled", len(pending), timeout)
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+        if self._detached:
+            done, pending = await asyncio.wait(list(self._detached), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)